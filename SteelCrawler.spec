@@ -1,7 +1,7 @@
 # -*- mode: python ; coding: utf-8 -*-
 from PyInstaller.utils.hooks import collect_all
 
-datas = [('streamlit_app.py', '.'), ('crawler_haoganghui.py', '.'), ('crawler_xinggang91.py', '.')]
+datas = [('streamlit_app.py', '.'), ('crawler_haoganghui.py', '.'), ('crawler_xinggang91.py', '.'), ('crawler_common.py', '.'), ('crawler_http.py', '.'), ('crawler_pool.py', '.'), ('crawler_storage.py', '.'), ('crawler_normalize.py', '.'), ('crawler_diff.py', '.'), ('crawler_job.py', '.'), ('crawler_spider.py', '.')]
 binaries = []
 hiddenimports = ['streamlit.runtime.scriptrunner.magic_funcs']
 tmp_ret = collect_all('streamlit')
@@ -18,6 +18,10 @@ tmp_ret = collect_all('undetected_chromedriver')
 datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
 tmp_ret = collect_all('openpyxl')
 datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
+tmp_ret = collect_all('requests')
+datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
+tmp_ret = collect_all('pyarrow')
+datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
 
 
 a = Analysis(
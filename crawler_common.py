@@ -0,0 +1,634 @@
+"""两个爬虫共用的辅助工具"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+
+class CommandCounter:
+    """统计 WebDriver 命令次数 (每条命令即一次 chromedriver HTTP 往返)"""
+
+    def __init__(self, driver):
+        self.count = 0
+        # 复用的浏览器 (浏览器池) 已被上一个计数器替换过，取原始方法避免层层嵌套
+        self._execute = getattr(driver, '_uncounted_execute', driver.execute)
+        driver._uncounted_execute = self._execute
+        # WebElement 的所有操作最终也走 driver.execute，替换实例方法即可全部计数
+        driver.execute = self._counting_execute
+
+    def _counting_execute(self, driver_command, params=None):
+        self.count += 1
+        return self._execute(driver_command, params)
+
+    def reset(self):
+        """清零并返回清零前的计数"""
+        count = self.count
+        self.count = 0
+        return count
+
+
+
+# 一次 execute_script 探测页面状态：表格内容指纹、行数、加载遮罩是否可见、当前激活页码
+PAGE_STATE_JS = """
+var bodySelectors = arguments[0], maskSelector = arguments[1], pagerSelector = arguments[2];
+function isVisible(el) {
+    return el.getClientRects().length > 0;
+}
+var body = null;
+for (var i = 0; i < bodySelectors.length; i++) {
+    var el = document.querySelector(bodySelectors[i]);
+    if (el && isVisible(el)) {
+        body = el;
+        break;
+    }
+}
+var text = body ? body.innerText : '';
+// FNV-1a 哈希，只回传指纹而不是整段文本
+var hash = 2166136261;
+for (var c = 0; c < text.length; c++) {
+    hash ^= text.charCodeAt(c);
+    hash = Math.imul(hash, 16777619) >>> 0;
+}
+var loading = false;
+var masks = maskSelector ? document.querySelectorAll(maskSelector) : [];
+for (var m = 0; m < masks.length; m++) {
+    if (isVisible(masks[m])) {
+        loading = true;
+        break;
+    }
+}
+var active = pagerSelector ? document.querySelector(pagerSelector) : null;
+var page = active ? parseInt(active.innerText.trim(), 10) : NaN;
+return {
+    fingerprint: text.length + ':' + hash.toString(16),
+    hasContent: text.trim().length > 0,
+    rows: body ? body.querySelectorAll('tr').length : 0,
+    loading: loading,
+    page: isNaN(page) ? null : page
+};
+"""
+
+
+class PageReadiness:
+    """按页面真实信号等待表格就绪，替代固定 sleep
+
+    就绪条件: 表格有内容且加载遮罩已消失；给定上一页状态时，还要求内容指纹变化，
+    并且 (两边都能读到页码时) 激活页码发生变化。超过 timeout 仍未就绪则返回最后一次状态。
+    """
+
+    def __init__(self, driver, body_selectors, mask_selector=None, pager_selector=None,
+                 timeout=15, poll_interval=0.1):
+        self.driver = driver
+        self.body_selectors = body_selectors
+        self.mask_selector = mask_selector
+        self.pager_selector = pager_selector
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.pending_wait = 0.0  # 尚未计入页面统计的等待时间
+
+    def probe(self):
+        """读取一次页面状态，失败返回 None"""
+        try:
+            return self.driver.execute_script(
+                PAGE_STATE_JS, self.body_selectors, self.mask_selector, self.pager_selector)
+        except Exception as e:
+            logging.debug(f"探测页面状态失败: {e}")
+            return None
+
+    def is_ready(self, state, previous=None):
+        """判断页面是否就绪"""
+        if not state or not state['hasContent'] or state['loading']:
+            return False
+        if previous is None:
+            return True
+        if state['fingerprint'] == previous['fingerprint']:
+            return False
+        if state['page'] is not None and previous['page'] is not None:
+            return state['page'] != previous['page']
+        return True
+
+    def wait(self, previous=None, timeout=None):
+        """等待页面就绪，返回 (最后一次状态, 等待秒数)"""
+        timeout = timeout or self.timeout
+        start = time.perf_counter()
+        while True:
+            state = self.probe()
+            if self.is_ready(state, previous):
+                break
+            if time.perf_counter() - start >= timeout:
+                logging.warning(f"等待页面就绪超时 ({timeout}s)")
+                break
+            time.sleep(self.poll_interval)
+
+        waited = time.perf_counter() - start
+        self.pending_wait += waited
+        logging.info(f"页面就绪等待 {waited:.2f}s")
+        return state, waited
+
+    def pop_wait(self):
+        """返回并清零累计等待时间"""
+        waited = self.pending_wait
+        self.pending_wait = 0.0
+        return round(waited, 3)
+
+
+def row_fingerprint(row):
+    """单行数据指纹 (字段按名称排序后哈希)"""
+    text = '\x1f'.join(f"{key}={row[key]}" for key in sorted(row))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def page_fingerprint(rows):
+    """整页数据指纹 (按行顺序)"""
+    digest = hashlib.blake2b(digest_size=8)
+    for row in rows:
+        digest.update(row_fingerprint(row).encode('ascii'))
+    return digest.hexdigest()
+
+
+class PageDeduplicator:
+    """按内容指纹去重
+
+    整页指纹: 识别翻页失败 (与上一页相同) 和翻页循环 (A→B→A)；
+    全程行指纹集合: 去掉翻页过程中因挂牌漂移在前面页面已出现过的行 (同一页内的相同行保留)
+    """
+
+    def __init__(self, rows=None):
+        self.pages = {}  # 页面指纹 -> 首次出现的页码
+        self.rows = set()
+        self.duplicate_rows = 0
+        if rows:
+            self.rows.update(row_fingerprint(row) for row in rows)
+
+    def seen_page(self, page, rows):
+        """登记本页；内容与之前某一页完全相同时返回那一页的页码，否则返回 None"""
+        if not rows:
+            return None
+        fingerprint = page_fingerprint(rows)
+        if fingerprint in self.pages:
+            return self.pages[fingerprint]
+        self.pages[fingerprint] = page
+        return None
+
+    def unique_rows(self, rows):
+        """去掉之前页面已出现过的行，并把本页的行加入集合"""
+        fingerprints = [row_fingerprint(row) for row in rows]
+        unique = [row for row, fp in zip(rows, fingerprints) if fp not in self.rows]
+        self.duplicate_rows += len(rows) - len(unique)
+        self.rows.update(fingerprints)
+        return unique
+
+
+def export_browser_session(driver):
+    """导出浏览器登录态: cookies 和 localStorage"""
+    local_storage = driver.execute_script(
+        "var d = {}; for (var i = 0; i < localStorage.length; i++) {"
+        " var k = localStorage.key(i); d[k] = localStorage.getItem(k); } return d;")
+    return {
+        'url': driver.current_url,
+        'cookies': driver.get_cookies(),
+        'local_storage': local_storage or {},
+    }
+
+
+def import_browser_session(driver, session, url):
+    """把登录态写入另一个浏览器并打开 url (cookies 只能在同域页面下写入)"""
+    parts = urlsplit(url)
+    driver.get(f"{parts.scheme}://{parts.netloc}/")
+
+    for cookie in session.get('cookies', []):
+        cookie = {k: v for k, v in cookie.items() if k in ('name', 'value', 'path', 'domain', 'secure', 'httpOnly', 'expiry')}
+        if 'expiry' in cookie:
+            cookie['expiry'] = int(cookie['expiry'])
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            logging.debug(f"写入 cookie {cookie.get('name')} 失败: {e}")
+
+    if session.get('local_storage'):
+        driver.execute_script(
+            "var d = arguments[0]; for (var k in d) { localStorage.setItem(k, d[k]); }",
+            session['local_storage'])
+
+    driver.get(url)
+
+
+# 未登录时价格单元格显示的占位文字
+LOGIN_PLACEHOLDERS = ['登录后查看', '登录可见']
+
+# 统计表格中有内容的数据行、以及其中仍显示登录占位文字的行数
+LOGIN_STATE_JS = """
+var placeholders = arguments[0];
+var rows = document.querySelectorAll('tbody tr');
+var filled = 0, locked = 0;
+for (var i = 0; i < rows.length; i++) {
+    var text = rows[i].innerText || rows[i].textContent || '';
+    if (!text.trim()) continue;
+    filled++;
+    for (var j = 0; j < placeholders.length; j++) {
+        if (text.indexOf(placeholders[j]) >= 0) { locked++; break; }
+    }
+}
+return [filled, locked];
+"""
+
+
+class SessionManager:
+    """按站点把登录后的 cookies 和 localStorage 保存到磁盘，新浏览器启动后恢复，省去每次手动登录
+
+    登录状态以价格单元格为准: 表格有数据且不再显示 "登录后查看" 即视为已登录
+    """
+
+    def __init__(self, site, url, path=None, poll_interval=0.5):
+        self.site = site
+        self.url = url
+        self.path = path or f"browser_session_{site}.json"
+        self.poll_interval = poll_interval
+
+    def load(self):
+        """读取保存的登录态，去掉已过期的 cookie；没有或全部过期时返回 None"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                session = json.load(f)
+        except ValueError as e:
+            logging.warning(f"登录态文件损坏，忽略: {e}")
+            return None
+        now = time.time()
+        session['cookies'] = [c for c in session.get('cookies', []) if not c.get('expiry') or c['expiry'] > now]
+        if not session['cookies'] and not session.get('local_storage'):
+            return None
+        return session
+
+    def save(self, driver):
+        session = export_browser_session(driver)
+        session['site'] = self.site
+        session['saved_ts'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(session, ensure_ascii=False))
+        os.replace(tmp_path, self.path)
+        logging.info(f"已保存 {self.site} 登录态 ({len(session['cookies'])} 个 cookie)")
+
+    def login_state(self, driver):
+        """返回 'logged_in' / 'anonymous' (价格显示占位文字) / 'pending' (表格还没有数据)"""
+        try:
+            filled, locked = driver.execute_script(LOGIN_STATE_JS, LOGIN_PLACEHOLDERS)
+        except Exception as e:
+            logging.debug(f"检查登录状态失败: {e}")
+            return 'pending'
+        if not filled:
+            return 'pending'
+        return 'anonymous' if locked else 'logged_in'
+
+    def wait_for_login(self, driver, timeout, stop_when_anonymous=False):
+        """轮询直到已登录 (立即返回 True) 或超时；stop_when_anonymous 时表格显示未登录即返回 False"""
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self.login_state(driver)
+            if state == 'logged_in':
+                return True
+            if (state == 'anonymous' and stop_when_anonymous) or time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    def restore(self, driver, timeout=10):
+        """把保存的登录态写入浏览器并重新打开站点，恢复后已登录时返回 True"""
+        session = self.load()
+        if session is None:
+            return False
+        logging.info(f"恢复 {self.site} 登录态 (保存于 {session.get('saved_ts', '未知时间')})")
+        import_browser_session(driver, session, self.url)
+        if self.wait_for_login(driver, timeout, stop_when_anonymous=True):
+            return True
+        logging.info("保存的登录态已失效，需要重新登录")
+        return False
+
+    def ensure_login(self, driver, login_timeout=0, probe_timeout=10):
+        """当前已登录 → 恢复保存的登录态 → 等待手动登录 (最多 login_timeout 秒)，登录后保存登录态"""
+        if self.wait_for_login(driver, probe_timeout, stop_when_anonymous=True):
+            logging.info("已处于登录状态")
+            self.save(driver)
+            return True
+        if self.restore(driver):
+            self.save(driver)
+            return True
+        if login_timeout <= 0:
+            return False
+        logging.info(f"请在浏览器中手动登录，登录后自动继续 (最多等待 {login_timeout} 秒)...")
+        if self.wait_for_login(driver, login_timeout):
+            self.save(driver)
+            return True
+        logging.warning("等待登录超时，价格可能显示为 '登录后查看'")
+        return False
+
+
+def enable_network_capture(chrome_options):
+    """开启 Chrome 性能日志以便读取网络请求 (需在创建驱动前调用)"""
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+
+# 精简加载: 只需要表格文字，屏蔽图片、字体、音视频和统计/广告脚本
+LEAN_BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.bmp',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.m3u8', '*.flv',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*hm.baidu.com*', '*cnzz.com*', '*51.la*', '*growingio.com*', '*sensorsdata*',
+]
+LEAN_CHROME_ARGS = [
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-sync',
+    '--disable-default-apps',
+    '--no-first-run',
+    '--mute-audio',
+    '--blink-settings=imagesEnabled=false',
+]
+LEAN_CHROME_PREFS = {
+    'profile.managed_default_content_settings.images': 2,
+    'profile.managed_default_content_settings.media_stream': 2,
+    'profile.default_content_setting_values.notifications': 2,
+}
+
+
+def apply_lean_options(chrome_options):
+    """精简加载的启动参数 (需在创建驱动前调用): 不加载图片、关闭扩展和后台网络，DOM 就绪即返回"""
+    for argument in LEAN_CHROME_ARGS:
+        chrome_options.add_argument(argument)
+    chrome_options.add_experimental_option('prefs', LEAN_CHROME_PREFS)
+    # eager: driver.get 在 DOMContentLoaded 后返回，不等图片和第三方脚本 (表格由 PageReadiness 等待)
+    chrome_options.page_load_strategy = 'eager'
+
+
+def block_resources(driver, patterns=None):
+    """通过 CDP 屏蔽匹配的请求 (对当前会话持续生效)，失败时只记录日志"""
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns or LEAN_BLOCKED_URLS})
+    except Exception as e:
+        logging.warning(f"设置资源屏蔽失败，按完整页面加载: {e}")
+
+
+def find_records(payload):
+    """在 JSON 响应中查找最长的对象数组，即列表接口返回的数据行"""
+    best = []
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            if node and len(node) > len(best) and all(isinstance(x, dict) for x in node):
+                best = node
+            stack.extend(x for x in node if isinstance(x, (dict, list)))
+    return best
+
+
+def format_api_value(value):
+    """接口原始值转为字符串，数值保留完整精度"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value).strip()
+
+
+def map_api_record(record, field_map):
+    """按字段别名表把接口记录映射为输出字段 (别名按顺序匹配，忽略大小写)"""
+    lowered = {str(k).lower(): v for k, v in record.items()}
+    item = {}
+    for field, aliases in field_map.items():
+        item[field] = ''
+        for alias in aliases:
+            value = lowered.get(alias.lower())
+            if value not in (None, ''):
+                item[field] = format_api_value(value)
+                break
+    return item
+
+
+class NetworkCapture:
+    """从 Chrome 性能日志收集 JSON 接口响应，响应体通过 CDP Network.getResponseBody 读取"""
+
+    def __init__(self, driver, url_pattern=None):
+        self.driver = driver
+        self.url_pattern = re.compile(url_pattern) if url_pattern else None
+        self.requests = {}  # requestId -> 请求信息 (url, method, headers, postData)
+        self._pending = {}  # 已收到响应头、等待 loadingFinished 的 JSON 请求
+
+    def drain(self):
+        """读取新产生的性能日志，返回本次新完成的 JSON 响应列表"""
+        responses = []
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            logging.debug(f"读取性能日志失败: {e}")
+            return responses
+
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method')
+            params = message.get('params', {})
+            request_id = params.get('requestId')
+
+            if method == 'Network.requestWillBeSent':
+                request = params.get('request', {})
+                self.requests[request_id] = {
+                    'url': request.get('url', ''),
+                    'method': request.get('method', 'GET'),
+                    'headers': request.get('headers', {}),
+                    'postData': request.get('postData'),
+                }
+            elif method == 'Network.responseReceived':
+                response = params.get('response', {})
+                url = response.get('url', '')
+                if 'json' not in (response.get('mimeType') or ''):
+                    continue
+                if self.url_pattern and not self.url_pattern.search(url):
+                    continue
+                self._pending[request_id] = url
+            elif method == 'Network.loadingFinished' and request_id in self._pending:
+                url = self._pending.pop(request_id)
+                payload = self.get_response_json(request_id)
+                if payload is not None:
+                    responses.append({
+                        'url': url,
+                        'request': self.requests.get(request_id, {'url': url}),
+                        'payload': payload,
+                    })
+        return responses
+
+    def get_response_json(self, request_id):
+        """读取响应体并解析为 JSON，失败返回 None"""
+        try:
+            result = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            body = result.get('body', '')
+            if result.get('base64Encoded'):
+                body = base64.b64decode(body).decode('utf-8')
+            return json.loads(body)
+        except Exception as e:
+            logging.debug(f"读取响应体失败 ({request_id}): {e}")
+            return None
+
+    def wait_for_listing(self, field_map, timeout=15, poll_interval=0.2):
+        """等待新的列表接口响应，返回 (响应, 数据行)；超时返回 (None, [])
+
+        同一批次有多个 JSON 响应时，选择数据行与字段别名表匹配度最高的一个 (相同则取最新)。
+        """
+        aliases = {alias.lower() for names in field_map.values() for alias in names}
+        start = time.perf_counter()
+        while True:
+            best, best_records, best_score = None, [], 0
+            for response in self.drain():
+                records = find_records(response['payload'])
+                if not records:
+                    continue
+                score = len(aliases & {str(k).lower() for k in records[0]})
+                if score and score >= best_score:
+                    best, best_records, best_score = response, records, score
+            if best:
+                logging.info(f"捕获接口响应: {best['url']} ({len(best_records)} 条)")
+                return best, best_records
+            if time.perf_counter() - start >= timeout:
+                return None, []
+            time.sleep(poll_interval)
+
+
+# 不产生结束标签的空元素
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+# 内容不可见的元素
+INVISIBLE_TAGS = {'script', 'style', 'template', 'noscript', 'head', 'title'}
+# 块级元素: 前后换行，与 innerText 的分行方式一致
+BLOCK_TAGS = {'div', 'p', 'br', 'li', 'ul', 'ol', 'tr', 'table', 'section', 'header', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+
+def normalize_text(text):
+    """按行压缩空白并去掉空行"""
+    lines = (' '.join(line.split()) for line in text.split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+class TableGridParser(HTMLParser):
+    """单次扫描 page_source，提取所有 <table> 的行和单元格文本 (不构建DOM树)"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tables = []
+        self.text_parts = []  # 页面可见文本
+        self._stack = []  # (tag, hidden, fixed, in_el_table)
+        self._table_stack = []  # (表格, 外层表格当前的行, 单元格)
+        self._row = None
+        self._cell = None
+
+    def _flags(self):
+        if self._stack:
+            return self._stack[-1][1:]
+        return (False, False, False)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        style = (attrs.get('style') or '').replace(' ', '').lower()
+        hidden, fixed, in_el_table = self._flags()
+        hidden = (hidden or tag in INVISIBLE_TAGS or 'is-hidden' in classes
+                  or 'display:none' in style or 'visibility:hidden' in style)
+        # el-table 的固定列会渲染一份重复表格
+        fixed = fixed or any(c.startswith('el-table__fixed') for c in classes)
+        in_el_table = in_el_table or 'el-table' in classes
+
+        if tag in BLOCK_TAGS and not hidden:
+            self._append_text('\n')
+
+        if tag == 'table':
+            table = {
+                'class': ' '.join(classes),
+                'hidden': hidden,
+                'fixed': fixed,
+                'in_el_table': in_el_table,
+                'rows': [],
+            }
+            self.tables.append(table)
+            # 嵌套表格结束后回到外层表格的行和单元格
+            self._table_stack.append((table, self._row, self._cell))
+            self._row = None
+            self._cell = None
+        elif tag == 'tr' and self._table_stack:
+            self._row = {'cells': []}
+            self._table_stack[-1][0]['rows'].append(self._row)
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = {'tag': tag, 'hidden': hidden, 'parts': []}
+            self._row['cells'].append(self._cell)
+
+        if tag not in VOID_TAGS:
+            self._stack.append((tag, hidden, fixed, in_el_table))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # 容错: 弹出到匹配的开始标签为止
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                break
+        else:
+            return
+        hidden = self._stack[i][1]
+        del self._stack[i:]
+
+        if tag in BLOCK_TAGS and not hidden:
+            self._append_text('\n')
+        if tag in ('td', 'th'):
+            self._cell = None
+            # 同一行的单元格在页面文本中以制表符分隔
+            self.text_parts.append('\t')
+        elif tag == 'tr':
+            self._row = None
+        elif tag == 'table' and self._table_stack:
+            _, self._row, self._cell = self._table_stack.pop()
+
+    def handle_data(self, data):
+        if not self._flags()[0]:
+            self._append_text(data)
+
+    def _append_text(self, text):
+        self.text_parts.append(text)
+        if self._cell is not None and not self._cell['hidden']:
+            self._cell['parts'].append(text)
+
+
+def parse_html_tables(page_source):
+    """解析 page_source，返回 (表格列表, 页面可见文本)
+
+    每个表格为 {'class', 'hidden', 'fixed', 'in_el_table', 'rows'}，
+    每行为 {'text': 行文本, 'cells': [(标签名, 单元格文本), ...]}，空单元格保留以维持列索引对齐。
+    """
+    parser = TableGridParser()
+    parser.feed(page_source)
+    parser.close()
+
+    for table in parser.tables:
+        rows = []
+        for row in table['rows']:
+            cells = [(cell['tag'], normalize_text(''.join(cell['parts']))) for cell in row['cells']]
+            rows.append({
+                'text': '\t'.join(text for _, text in cells if text),
+                'cells': cells,
+            })
+        table['rows'] = rows
+
+    return parser.tables, normalize_text(''.join(parser.text_parts))
@@ -0,0 +1,202 @@
+"""与上一次采集比较，只输出新增、下架和价格变化的挂牌"""
+import json
+import logging
+import os
+import re
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+
+from crawler_common import row_fingerprint
+from crawler_storage import parse_number
+
+# 挂牌身份字段 (站点内唯一标识一条挂牌)；产地字段两个站点不同，取第一个存在的
+IDENTITY_FIELDS = ['品名', '材质', '规格', '负差']
+ORIGIN_FIELDS = ['提货地', '品牌']
+PRICE_FIELDS = ['价格(元/吨)', '元/吨']
+KEY_SEPARATOR = '\x1f'
+WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=65536)
+def normalize_key_part(value):
+    """全角转半角、去掉多余空白、忽略大小写，避免同一挂牌因显示差异被识别为新挂牌 (取值重复度高，结果缓存)"""
+    value = unicodedata.normalize('NFKC', str(value or ''))
+    return WHITESPACE.sub(' ', value).strip().casefold()
+
+
+def listing_key(row, site):
+    parts = [site] + [row.get(field, '') for field in IDENTITY_FIELDS]
+    parts.append(next((row[field] for field in ORIGIN_FIELDS if field in row), ''))
+    return KEY_SEPARATOR.join(normalize_key_part(part) for part in parts)
+
+
+def listing_price(row):
+    return next((row[field] for field in PRICE_FIELDS if field in row), '')
+
+
+def index_listings(rows, site):
+    """按身份键建立哈希索引 {键: 数据行}；同一身份出现多次时保留第一条"""
+    index = {}
+    duplicates = 0
+    for row in rows:
+        key = listing_key(row, site)
+        if key in index:
+            duplicates += 1
+            continue
+        index[key] = row
+    if duplicates:
+        logging.info(f"{duplicates} 条挂牌与已有挂牌身份相同，比较时忽略")
+    return index
+
+
+def price_changed(old, new):
+    if old == new:
+        return False
+    old_value, new_value = parse_number(old), parse_number(new)
+    if old_value is None or new_value is None:
+        return str(old).strip() != str(new).strip()
+    return old_value != new_value
+
+
+def diff_listings(previous, current):
+    """比较两个索引，返回 {'new': [...], 'removed': [...], 'changed': [...]}
+
+    只做键集合运算和逐键查找，不对全量数据做 merge；changed 中附带 原价格 和 价格变化
+    """
+    new = [current[key] for key in current.keys() - previous.keys()]
+    removed = [previous[key] for key in previous.keys() - current.keys()]
+    changed = []
+    for key in current.keys() & previous.keys():
+        old_price, new_price = listing_price(previous[key]), listing_price(current[key])
+        if price_changed(old_price, new_price):
+            row = dict(current[key])
+            row['原价格'] = old_price
+            old_value, new_value = parse_number(old_price), parse_number(new_price)
+            row['价格变化'] = (new_value - old_value) if old_value is not None and new_value is not None else None
+            changed.append(row)
+    return {'new': new, 'removed': removed, 'changed': changed}
+
+
+def diff_records(diff):
+    """展开为带 变化类型 字段的数据行，供下游任务逐条处理"""
+    labels = {'new': '新增', 'removed': '下架', 'changed': '价格变化'}
+    return [{'变化类型': labels[kind], **row} for kind in ('new', 'removed', 'changed') for row in diff[kind]]
+
+
+class ListingSnapshot:
+    """每个站点保存上一次完整采集的挂牌索引 (JSON)，update() 比较并在本次采集完整时替换为本次结果"""
+
+    def __init__(self, site, path=None):
+        self.site = site
+        self.path = path or f"crawl_snapshot_{site}.json"
+
+    def load(self):
+        """读取上一次的索引，没有快照时返回 None"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)['listings']
+        except (ValueError, KeyError) as e:
+            logging.warning(f"快照文件损坏，本次作为首次采集: {e}")
+            return None
+
+    def save(self, index):
+        # 先写临时文件再替换，避免中断时留下半个快照
+        tmp_path = self.path + '.tmp'
+        snapshot = {'site': self.site, 'saved_ts': datetime.now().isoformat(timespec='seconds'), 'listings': index}
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # json.dumps 走 C 编码器，比 json.dump 逐块写入快得多
+            f.write(json.dumps(snapshot, ensure_ascii=False))
+        os.replace(tmp_path, self.path)
+
+    def update(self, rows, complete=True):
+        """与上一次快照比较；首次采集时返回 None
+
+        complete=False (没有采集到最后一页: max_pages 限制、去重/水位线提前结束、取消) 时结果只覆盖部分页面，
+        不替换快照，也不把未采集到的挂牌算作下架，只输出新增和价格变化 (diff['partial'] 为 True)
+        """
+        current = index_listings(rows, self.site)
+        previous = self.load()
+        if complete:
+            self.save(current)
+        if previous is None:
+            if complete:
+                logging.info(f"首次保存 {self.site} 快照 ({len(current)} 条挂牌)，下次采集起输出变化")
+            else:
+                logging.info(f"本次采集没有到达最后一页，不保存 {self.site} 快照")
+            return None
+
+        diff = diff_listings(previous, current)
+        if not complete:
+            diff['removed'] = []
+            diff['partial'] = True
+            logging.info("本次采集没有到达最后一页，快照保持不变，不统计下架")
+        logging.info(f"与上次采集相比: 新增 {len(diff['new'])} 条，下架 {len(diff['removed'])} 条，"
+                     f"价格变化 {len(diff['changed'])} 条")
+        return diff
+
+
+def write_diff(diff, path):
+    """把变化写成 JSON Lines (每行一条)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in diff_records(diff):
+            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+    return path
+
+
+class CrawlWatermark:
+    """定时增量采集的水位线: 保存上次采集前几页的行指纹
+
+    列表按最新在前排序时，遇到整页数据都在水位线中的页面，说明之后的页面上次都已采集过，可以提前结束
+    """
+
+    def __init__(self, site, path=None, pages=3):
+        self.site = site
+        self.path = path or f"crawl_watermark_{site}.json"
+        self.pages = pages
+        self.previous = self.load()
+        self.current = set()
+        self.pages_seen = 0
+        self.stopped_at = None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return set()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return set(json.load(f)['fingerprints'])
+        except (ValueError, KeyError) as e:
+            logging.warning(f"水位线文件损坏，本次完整采集: {e}")
+            return set()
+
+    def reached(self, page, rows):
+        """记录本页的行指纹；本页所有行都已在上次的水位线中时返回 True"""
+        fingerprints = {row_fingerprint(row) for row in rows}
+        self.pages_seen += 1
+        if self.pages_seen <= self.pages:
+            self.current |= fingerprints
+        if fingerprints and self.previous and fingerprints <= self.previous:
+            self.stopped_at = page
+            return True
+        return False
+
+    def report(self, total_pages=0):
+        """提前结束时返回 {'stopped_at': 页码, 'skipped_pages': 跳过的页数 (总页数未知时为 None)}"""
+        if self.stopped_at is None:
+            return None
+        skipped = max(total_pages - self.stopped_at, 0) if total_pages else None
+        logging.info(f"第 {self.stopped_at} 页的数据上次均已采集，提前结束"
+                     f"{f'，跳过 {skipped} 页' if skipped is not None else ''}")
+        return {'stopped_at': self.stopped_at, 'skipped_pages': skipped}
+
+    def save(self):
+        """保存本次前 pages 页的指纹，作为下一次的水位线"""
+        if not self.current:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'site': self.site, 'saved_ts': datetime.now().isoformat(timespec='seconds'),
+                                'fingerprints': sorted(self.current)}))
+        os.replace(tmp_path, self.path)
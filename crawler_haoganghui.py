@@ -3,12 +3,21 @@ import pandas as pd
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import logging
+import os
 import re
+from crawler_common import (CommandCounter, NetworkCapture, PageReadiness, SessionManager,
+                            apply_lean_options, block_resources, enable_network_capture, map_api_record, parse_html_tables)
+from crawler_diff import CrawlWatermark, ListingSnapshot, write_diff
+from crawler_normalize import normalize_haoganghui
+from crawler_spider import SpiderMixin
+from crawler_storage import (SAVE_BATCH_SIZE, CsvSink, ListingStore, RecordBuffer, SqliteSink,
+                             XlsxSink, close_sinks, open_sinks, records_frame, write_parquet, write_sinks)
 
 # 设置日志
 logging.basicConfig(
@@ -19,14 +28,177 @@ logging.basicConfig(
     ]
 )
 
-class HaoganghuiSpider:
-    def __init__(self, headless=False, interactive=True):
+# 浏览器内完成表格定位、行查找和单元格文本收集，一次 execute_script 返回紧凑矩阵
+# 选择器顺序与判定规则与逐元素查询方式保持一致；不可见元素返回空文本，与 WebElement.text 一致
+TABLE_MATRIX_JS = """
+var tableSelectors = arguments[0], rowSelectors = arguments[1], cellSelectors = arguments[2];
+function isVisible(el) {
+    return el.getClientRects().length > 0;
+}
+function visibleText(el) {
+    return isVisible(el) ? el.innerText.trim() : '';
+}
+var table = null, matched = null;
+for (var i = 0; i < tableSelectors.length && !table; i++) {
+    var elements = document.querySelectorAll(tableSelectors[i]);
+    for (var j = 0; j < elements.length; j++) {
+        var elem = elements[j];
+        if (!isVisible(elem)) {
+            continue;
+        }
+        if (elem.tagName === 'TABLE') {
+            table = elem;
+        } else {
+            var cls = elem.getAttribute('class');
+            if (cls === null) {
+                break;  // 无 class 属性时放弃该选择器
+            }
+            if (cls.indexOf('table') >= 0 || elem.innerText.split('\\n').length > 5) {
+                table = elem;
+            }
+        }
+        if (table) {
+            matched = tableSelectors[i];
+            break;
+        }
+    }
+}
+if (!table) {
+    return null;
+}
+var rows = [], rowSelector = null;
+for (var k = 0; k < rowSelectors.length; k++) {
+    rowSelector = rowSelectors[k];
+    rows = rowSelector.indexOf('tr') === 0 ? table.getElementsByTagName('tr') : table.querySelectorAll(rowSelector);
+    if (rows.length > 1) {
+        break;
+    }
+}
+if (!rows.length) {
+    rows = document.querySelectorAll("tr, .row, [class*='row']");
+    rowSelector = null;
+}
+var matrix = [];
+for (var r = 0; r < rows.length; r++) {
+    var cells = [];
+    for (var c = 0; c < cellSelectors.length; c++) {
+        cells = rows[r].querySelectorAll(cellSelectors[c]);
+        if (cells.length) {
+            break;
+        }
+    }
+    var cellTexts = [];
+    for (var n = 0; n < cells.length; n++) {
+        cellTexts.push(visibleText(cells[n]));
+    }
+    matrix.push({text: visibleText(rows[r]), cells: cellTexts});
+}
+return {selector: matched, rowSelector: rowSelector, rows: matrix};
+"""
+
+# 表格 / 行 / 单元格选择器 (按优先级)
+TABLE_SELECTORS = [
+    "table",  # 标准表格
+    "div.table",  # div实现的表格
+    "div.data-table",  # 数据表格
+    ".table-container",  # 表格容器
+    ".data-container",  # 数据容器
+    "[class*='table']",  # 包含table的类
+    "[class*='data']",  # 包含data的类
+    "#dataTable",  # ID为dataTable
+    "#tableData",  # ID为tableData
+]
+ROW_SELECTORS = [
+    "tr",  # 表格行
+    "tbody tr",  # 表格体中的行
+    "table tr",  # 表格中的行
+    ".row",  # 行类
+    "[class*='row']",  # 包含row的类
+    ".data-row",  # 数据行
+    "div.row",  # div行
+]
+CELL_SELECTORS = ['td', 'th', 'div.cell', 'span.cell', '.col', '[class*="col"]']
+
+# 分页链接中的页码参数，如 ?p=3 / &page=3
+PAGE_URL_PATTERN = re.compile(r'([?&](?:p|page|pageNo|pageNum)=)(\d+)')
+
+# 导出列顺序
+EXPORT_COLUMNS = ['品名', '品类', '材质', '规格', '负差', '支重', '长度', '支/件', '元/吨', '提货地']
+
+# 表头关键词
+HEADER_KEYWORDS = ['品名', '材质', '规格', '价格', '库存', '表头', '标题']
+
+# 列表接口字段别名 (按顺序匹配，忽略大小写)，用于把 XHR 原始记录映射到输出字段
+API_FIELD_MAP = {
+    '品名': ['productName', 'goodsName', 'breedName', 'pm', 'name'],
+    '品类': ['category', 'categoryName', 'className', 'pl'],
+    '材质': ['material', 'materialName', 'texture', 'cz'],
+    '规格': ['spec', 'specs', 'specification', 'gg'],
+    '负差': ['tolerance', 'negativeDeviation', 'deviation', 'fc'],
+    '支重': ['pieceWeight', 'singleWeight', 'weightPerPiece', 'zz'],
+    '长度': ['length', 'len', 'cd'],
+    '支/件': ['piecesPerBundle', 'pieceNum', 'numPerPiece', 'zj'],
+    '元/吨': ['price', 'unitPrice', 'salePrice', 'jg'],
+    '提货地': ['warehouse', 'warehouseName', 'storehouse', 'deliveryPlace', 'ck'],
+}
+
+def has_listing_fields(item):
+    """接口记录的 品名、材质、规格、元/吨 全为空时不是有效挂牌"""
+    return any(item[field] for field in ['品名', '材质', '规格', '元/吨'])
+
+class HaoganghuiSpider(SpiderMixin):
+    site = "haoganghui"  # 站点代码 (文件名、历史库、浏览器池用户目录)
+    lean_profile = True  # 默认使用精简加载 (屏蔽图片/字体/统计脚本)，页面异常时可按站点关闭
+    http_row_filter = staticmethod(has_listing_fields)  # 接口返回的空行 (无品名/材质/规格/价格) 不计入结果
+
+    def __init__(self, headless=False, interactive=True, extract_mode='js', ready_timeout=15, page_delay=0,
+                 capture_network=False, api_url_pattern=None, driver=None, profile_dir=None, lean=None):
         self.url = "https://www.haoganghui.cn/Main/cuohe_index"
+        self.crawl_started_at = None
+        self.watermark_report = None
+        self.duplicate_rows = 0
+        self.stop_event = None  # threading.Event，设置后在页与页之间停止 (协作式取消)
+        self.progress_callback = None  # 每完成一页回调 progress_callback(进度 dict)
+        self.cancelled = False
+        self.reached_end = False  # 本次采集确认到达了最后一页 (结果完整，可以更新变化快照)
         self.interactive = interactive
+        # 提取模式: 'js' 浏览器内一次性提取; 'html' 离线解析 page_source;
+        # 'xhr' 读取页面的列表接口响应; 'dom' 逐元素查询 (旧方式)
+        self.extract_mode = extract_mode
+        # 捕获网络响应 (xhr 模式自动开启)；api_url_pattern 为接口地址正则，None 表示按字段自动识别
+        self.capture_network = capture_network or extract_mode == 'xhr'
+        self.api_url_pattern = api_url_pattern
+        self.api_field_map = dict(API_FIELD_MAP)
+        self.capture = None
+        self.ready_timeout = ready_timeout  # 等待页面就绪的上限 (秒)
+        self.page_delay = page_delay  # 页面间额外延迟 (秒)，默认不等待
+        self.lean = self.lean_profile if lean is None else lean
+        self.profile_dir = profile_dir  # 持久化的 Chrome 用户目录 (登录态、缓存跨次保留)，None 为临时目录
+        self.session = SessionManager(self.site, self.url)  # 保存/恢复登录态 (cookies、localStorage)
         self.data = []
+        self.page_metrics = []  # 每页统计: 行数、WebDriver命令数、提取耗时、就绪等待时间
         self.driver = None
-        self.setup_driver(headless)
+        # 传入 driver 时直接复用 (浏览器池中已预热的浏览器)，否则新启动一个
+        if driver is not None:
+            self.attach_driver(driver)
+        else:
+            self.setup_driver(headless)
         
+    def attach_driver(self, driver):
+        """绑定浏览器驱动: 命令计数、网络捕获和页面就绪检测"""
+        self.driver = driver
+        self.commands = CommandCounter(driver)
+        self.capture = NetworkCapture(driver, self.api_url_pattern) if self.capture_network else None
+        if self.lean:
+            block_resources(driver)
+        self.readiness = PageReadiness(
+            self.driver,
+            ["table tbody", "table", "div.data-table", ".table-container", "#dataTable", "#tableData"],
+            mask_selector=".loading, .loading-mask, .layui-layer-loading, .el-loading-mask",
+            pager_selector=".pagination .active, .pagination .current, .page .active, .page .current",
+            timeout=self.ready_timeout,
+        )
+    
     def setup_driver(self, headless=False):
         """设置Chrome驱动"""
         try:
@@ -54,7 +226,14 @@ class HaoganghuiSpider:
             # 禁用图片加载，加快速度
             chrome_options.add_argument('--blink-settings=imagesEnabled=false')
             
-            self.driver = webdriver.Chrome(options=chrome_options)
+            if self.capture_network:
+                enable_network_capture(chrome_options)
+            if self.lean:
+                apply_lean_options(chrome_options)
+            if self.profile_dir:
+                chrome_options.add_argument(f'--user-data-dir={os.path.abspath(self.profile_dir)}')
+            
+            self.attach_driver(webdriver.Chrome(options=chrome_options))
             logging.info("Chrome驱动初始化完成")
             
         except Exception as e:
@@ -73,10 +252,14 @@ class HaoganghuiSpider:
             return None
     
     def login_if_needed(self):
-        """检查是否需要登录"""
+        """检查是否需要登录 (已登录或保存的登录态仍有效时直接继续)"""
         try:
-            # 检查是否有登录提示
-            time.sleep(3)
+            if not self.interactive:
+                # 非交互模式：恢复登录态，失效时等待手动登录，价格可见的那一刻即继续
+                self.session.ensure_login(self.driver, login_timeout=30)
+                return
+            if self.session.ensure_login(self.driver):
+                return
             
             # 检查是否有需要登录的提示
             login_elements = self.driver.find_elements(By.XPATH, 
@@ -84,41 +267,150 @@ class HaoganghuiSpider:
             
             if login_elements:
                 logging.warning("可能需要登录才能查看完整数据")
-                if self.interactive:
-                    print("\n" + "="*50)
-                    print("提示：如果页面显示需要登录，请手动登录后继续")
-                    print("="*50)
-                    input("按回车键继续...")
-                else:
-                    logging.info("检测到可能需要登录，等待30秒供用户手动登录...")
-                    time.sleep(30)
+                print("\n" + "="*50)
+                print("提示：如果页面显示需要登录，请手动登录后继续")
+                print("="*50)
+                input("按回车键继续...")
+                if self.session.wait_for_login(self.driver, 10):
+                    self.session.save(self.driver)
                 
         except Exception as e:
             logging.debug(f"登录检查出错: {e}")
     
     def extract_table_data(self):
         """提取表格数据"""
+        logging.info("正在定位表格数据...")
+        
+        # 等待表格加载
+        self.readiness.wait()
+        
+        self.commands.reset()
+        start = time.perf_counter()
+        if self.extract_mode == 'js':
+            extracted_data = self.extract_table_data_js()
+        elif self.extract_mode == 'html':
+            extracted_data = self.parse_page_source(self.driver.page_source)
+        elif self.extract_mode == 'xhr':
+            extracted_data = self.extract_captured_data()
+        else:
+            extracted_data = self.extract_table_data_dom()
+        
+        self.last_extract_stats = {
+            'commands': self.commands.reset(),
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+        logging.info(f"本页提取耗时 {self.last_extract_stats['seconds']}s，"
+                     f"WebDriver命令 {self.last_extract_stats['commands']} 次")
+        return extracted_data
+    
+    def extract_table_data_js(self):
+        """在浏览器内一次性完成表格定位和单元格提取 (单次 execute_script)"""
         try:
-            logging.info("正在定位表格数据...")
-            
-            # 等待表格加载
-            time.sleep(5)
-            
-            # 尝试多种方式定位表格
-            table_selectors = [
-                "table",  # 标准表格
-                "div.table",  # div实现的表格
-                "div.data-table",  # 数据表格
-                ".table-container",  # 表格容器
-                ".data-container",  # 数据容器
-                "[class*='table']",  # 包含table的类
-                "[class*='data']",  # 包含data的类
-                "#dataTable",  # ID为dataTable
-                "#tableData",  # ID为tableData
-            ]
+            snapshot = self.driver.execute_script(
+                TABLE_MATRIX_JS, TABLE_SELECTORS, ROW_SELECTORS, CELL_SELECTORS)
+            
+            if not snapshot:
+                logging.warning("未找到明显的表格元素，尝试直接提取所有数据行")
+                return self.extract_data_directly()
+            
+            logging.info(f"找到表格元素: {snapshot['selector']}")
+            if snapshot['rowSelector']:
+                logging.info(f"使用选择器 {snapshot['rowSelector']} 找到 {len(snapshot['rows'])} 行")
+            else:
+                logging.info(f"直接查找找到 {len(snapshot['rows'])} 行")
+            
+            # 先收集整页的单元格矩阵，再按列批量转换
+            matrix = [row['cells'] for i, row in enumerate(snapshot['rows'])
+                      if not self.is_skipped_row(i, row['text'])]
+            extracted_data = normalize_haoganghui(matrix)
+            
+            logging.info(f"共提取 {len(extracted_data)} 条数据")
+            return extracted_data
             
+        except Exception as e:
+            logging.error(f"提取表格数据失败: {e}")
+            return []
+    
+    def extract_captured_data(self):
+        """从捕获的列表接口响应中提取数据，无需渲染和DOM查询"""
+        response, records = self.capture.wait_for_listing(self.api_field_map, timeout=self.ready_timeout)
+        if not records:
+            logging.warning("未捕获到列表接口响应，改用浏览器内提取")
+            return self.extract_table_data_js()
+        
+        extracted_data = [item for item in map(self.parse_api_record, records) if has_listing_fields(item)]
+        
+        logging.info(f"共提取 {len(extracted_data)} 条数据")
+        return extracted_data
+    
+    def parse_api_record(self, record):
+        """将接口原始记录映射为输出字段 (数值保留完整精度)"""
+        item = map_api_record(record, self.api_field_map)
+        
+        # 与表格提取规则一致: 负差去掉正负号，提货地只保留后四个字
+        item['负差'] = item['负差'].replace('+', '').replace('-', '~').strip()
+        if len(item['提货地']) > 4:
+            item['提货地'] = item['提货地'][-4:]
+        
+        self.clean_data(item)
+        return item
+    
+    def parse_page_source(self, page_source):
+        """离线解析 page_source 中的表格 (不发起 WebDriver 查询，可在后台线程执行)"""
+        start = time.perf_counter()
+        try:
+            tables, page_text = parse_html_tables(page_source)
+            
+            # 与浏览器内提取一致：使用第一个可见且有数据行的表格
+            table = next((t for t in tables if not t['hidden'] and t['rows']), None)
+            if not table:
+                logging.warning("未找到明显的表格元素，尝试从页面文本提取数据")
+                return self.extract_data_from_text(page_text)
+            
+            logging.info(f"找到表格元素: table ({len(table['rows'])} 行)")
+            
+            matrix = []
+            for i, row in enumerate(table['rows']):
+                if self.is_skipped_row(i, row['text']):
+                    continue
+                
+                # 与单元格选择器顺序一致: 优先 td，没有再用 th
+                cell_texts = [text for tag, text in row['cells'] if tag == 'td']
+                if not cell_texts:
+                    cell_texts = [text for tag, text in row['cells'] if tag == 'th']
+                matrix.append(cell_texts)
+            
+            # 整页按列批量转换
+            extracted_data = normalize_haoganghui(matrix)
+            
+            logging.info(f"共提取 {len(extracted_data)} 条数据")
+            return extracted_data
+            
+        except Exception as e:
+            logging.error(f"解析页面HTML失败: {e}")
+            return []
+        finally:
+            self.last_extract_stats = {'commands': 0, 'seconds': round(time.perf_counter() - start, 3)}
+    
+    def is_skipped_row(self, index, row_text):
+        """判断是否为空行或表头行"""
+        # 跳过空行和表头行（假设表头包含特定关键词）
+        if not row_text or len(row_text) < 10:
+            return True
+        
+        # 跳过明显的标题行
+        if any(keyword in row_text for keyword in HEADER_KEYWORDS):
+            if index == 0:  # 如果是第一行，可能是表头
+                logging.info(f"跳过表头行: {row_text[:50]}...")
+                return True
+        
+        return False
+    
+    def extract_table_data_dom(self):
+        """逐元素查询提取表格数据"""
+        try:
             table = None
-            for selector in table_selectors:
+            for selector in TABLE_SELECTORS:
                 try:
                     elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
                     for elem in elements:
@@ -143,17 +435,7 @@ class HaoganghuiSpider:
             rows = []
             
             # 尝试不同的行选择器
-            row_selectors = [
-                "tr",  # 表格行
-                "tbody tr",  # 表格体中的行
-                "table tr",  # 表格中的行
-                ".row",  # 行类
-                "[class*='row']",  # 包含row的类
-                ".data-row",  # 数据行
-                "div.row",  # div行
-            ]
-            
-            for selector in row_selectors:
+            for selector in ROW_SELECTORS:
                 try:
                     if selector.startswith('tr'):
                         rows = table.find_elements(By.TAG_NAME, 'tr')
@@ -178,16 +460,9 @@ class HaoganghuiSpider:
                 try:
                     row_text = row.text.strip()
                     
-                    # 跳过空行和表头行（假设表头包含特定关键词）
-                    if not row_text or len(row_text) < 10:
+                    if self.is_skipped_row(i, row_text):
                         continue
                     
-                    # 跳过明显的标题行
-                    if any(keyword in row_text for keyword in ['品名', '材质', '规格', '价格', '库存', '表头', '标题']):
-                        if i == 0:  # 如果是第一行，可能是表头
-                            logging.info(f"跳过表头行: {row_text[:50]}...")
-                            continue
-                    
                     # 提取行数据
                     item = self.parse_row_data(row, row_text)
                     if item:
@@ -207,12 +482,20 @@ class HaoganghuiSpider:
     
     def extract_data_directly(self):
         """直接提取页面中的数据"""
-        extracted_data = []
-        
         try:
             # 获取整个页面的文本
             page_text = self.driver.find_element(By.TAG_NAME, 'body').text
-            
+        except Exception as e:
+            logging.error(f"直接提取数据失败: {e}")
+            return []
+        
+        return self.extract_data_from_text(page_text)
+    
+    def extract_data_from_text(self, page_text):
+        """从页面文本中提取数据行"""
+        extracted_data = []
+        
+        try:
             # 按行分割
             lines = page_text.split('\n')
             
@@ -257,27 +540,11 @@ class HaoganghuiSpider:
     def parse_row_data(self, row_element, row_text):
         """解析行数据"""
         try:
-            # 创建数据项 - 只包含需要的字段
-            item = {
-                '品名': '',
-                '品类': '',
-                '材质': '',
-                '规格': '',
-                '负差': '',
-                '支重': '',
-                '长度': '',
-                '支/件': '',
-                '元/吨': '',
-                '提货地': '',
-            }
-            
             # 尝试获取单元格数据
             cells = []
             
             # 尝试不同的单元格选择器
-            cell_selectors = ['td', 'th', 'div.cell', 'span.cell', '.col', '[class*="col"]']
-            
-            for selector in cell_selectors:
+            for selector in CELL_SELECTORS:
                 try:
                     cells = row_element.find_elements(By.CSS_SELECTOR, selector)
                     if cells:
@@ -285,73 +552,22 @@ class HaoganghuiSpider:
                 except:
                     continue
             
-            # 如果没有找到标准单元格，尝试分割文本
-            if cells:
-                # 保留空单元格以维持索引对应关系
-                cell_texts = [cell.text.strip() for cell in cells]
-                
-                # 根据用户提供的列顺序: 品名 品类 材质 规格 负差/支重 长度 支/件 件数 件重 元/吨 仓库
-                if len(cell_texts) >= 11:
-                    item['品名'] = cell_texts[0]
-                    item['品类'] = cell_texts[1]
-                    item['材质'] = cell_texts[2]
-                    item['规格'] = cell_texts[3]
-                    
-                    # 处理 负差/支重 (索引4)
-                    combined_val = cell_texts[4]
-                    if '/' in combined_val:
-                        parts = combined_val.split('/')
-                        # 负差去掉正负号
-                        item['负差'] = parts[0].replace('+', '').replace('-', '~').strip()
-                        if len(parts) > 1:
-                            item['支重'] = parts[1].strip()
-                    else:
-                        # 如果没有斜杠，尝试直接赋值给负差(去掉符号)
-                        item['负差'] = combined_val.replace('+', '').replace('-', '~').strip()
-                    
-                    item['长度'] = cell_texts[5]
-                    item['支/件'] = cell_texts[6]
-                    # 跳过 件数(7) 和 件重(8)
-                    item['元/吨'] = cell_texts[9]
-                    # 只保留后四个字
-                    if len(cell_texts[10].strip()) > 4:
-                        item['提货地'] = cell_texts[10].strip()[-4:]
-                    else:
-                        item['提货地'] = cell_texts[10].strip()
-                elif len(cell_texts) >= 10:
-                    # 兼容旧格式或缺少仓库的情况
-                    item['品名'] = cell_texts[0]
-                    item['品类'] = cell_texts[1]
-                    item['材质'] = cell_texts[2]
-                    item['规格'] = cell_texts[3]
-                    
-                    # 处理 负差/支重
-                    combined_val = cell_texts[4]
-                    if '/' in combined_val:
-                        parts = combined_val.split('/')
-                        item['负差'] = parts[0].replace('+', '').replace('-', '~').strip()
-                        if len(parts) > 1:
-                            item['支重'] = parts[1].strip()
-                    else:
-                        item['负差'] = combined_val.replace('+', '').replace('-', '~').strip()
-
-                    item['长度'] = cell_texts[5]
-                    item['支/件'] = cell_texts[6]
-                    item['元/吨'] = cell_texts[9]
-            
-            # 清理数据
-            self.clean_data(item)
-            
-            # 如果完全没有提取到有效数据，返回None
-            if not any(item[field] for field in ['品名', '材质', '规格', '元/吨']):
-                return None
-                
-            return item
+            # 保留空单元格以维持索引对应关系
+            return self.parse_cell_texts([cell.text.strip() for cell in cells])
             
         except Exception as e:
             logging.debug(f"解析行数据失败: {e}")
             return None
     
+    def parse_cell_texts(self, cell_texts):
+        """按列顺序将单元格文本映射为数据项 (单行调用批量转换的列规则)，无有效数据时返回 None"""
+        try:
+            items = normalize_haoganghui([cell_texts])
+            return items[0] if items else None
+        except Exception as e:
+            logging.debug(f"解析行数据失败: {e}")
+            return None
+    
     def parse_text_line(self, text_line):
         """解析文本行数据"""
         try:
@@ -510,9 +726,11 @@ class HaoganghuiSpider:
         try:
             logging.info("尝试查找翻页控件...")
             
+            # 记录翻页前的页面状态，用于判断新页面是否渲染完成
+            before = self.readiness.probe()
+            
             # 滚动到底部
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
             
             # 尝试查找分页控件
             pagination_selectors = [
@@ -562,11 +780,10 @@ class HaoganghuiSpider:
                             if next_btn.is_displayed() and next_btn.is_enabled():
                                 # 滚动到按钮位置
                                 self.driver.execute_script("arguments[0].scrollIntoView(true);", next_btn)
-                                time.sleep(1)
                                 
                                 # 点击按钮
                                 self.driver.execute_script("arguments[0].click();", next_btn)
-                                time.sleep(5)
+                                self.readiness.wait(previous=before)
                                 logging.info("已点击下一页")
                                 return True
                 except:
@@ -591,7 +808,7 @@ class HaoganghuiSpider:
                             for link in next_page_links:
                                 if link.is_displayed():
                                     self.driver.execute_script("arguments[0].click();", link)
-                                    time.sleep(5)
+                                    self.readiness.wait(previous=before)
                                     logging.info(f"已点击第{next_page}页")
                                     return True
             except:
@@ -604,91 +821,80 @@ class HaoganghuiSpider:
             logging.error(f"翻页失败: {e}")
             return False
     
-    def crawl(self, max_pages=None, skip_init=False):
-        """执行爬取"""
+    def find_page_url(self, page):
+        """如果分页链接带页码参数，返回指定页的 URL"""
+        hrefs = self.driver.execute_script(
+            "return Array.prototype.map.call(document.querySelectorAll(arguments[0]), function (a) { return a.href; });",
+            ".pagination a[href], .page a[href], [class*='paging'] a[href], [class*='page'] a[href]")
+        for href in hrefs or []:
+            if PAGE_URL_PATTERN.search(href):
+                return PAGE_URL_PATTERN.sub(lambda m: m.group(1) + str(page), href, count=1)
+        return None
+    
+    def goto_page(self, page):
+        """跳转到指定页: 优先使用分页链接的页码参数，其次跳页输入框，必要时退回逐页翻页"""
+        before = self.readiness.probe()
+        if before and before['page'] == page:
+            return True
+        
+        def arrived(state):
+            # 读不到页码时以表格内容变化为准
+            return self.readiness.is_ready(state, before) and state['page'] in (page, None)
+        
+        # 1. URL 页码参数
         try:
-            if not skip_init:
-                logging.info(f"开始访问网站: {self.url}")
-                self.driver.get(self.url)
-                
-                # 等待页面加载
-                time.sleep(10)  # 给予足够时间加载
-                
-                # 检查是否需要登录
-                self.login_if_needed()
-            
-            # 如果没有指定页数，询问用户
-            if max_pages is None:
-                try:
-                    print("\n" + "="*50)
-                    print("登录完成后，请输入要爬取的页数")
-                    print("直接回车: 爬取直到没有下一页")
-                    print("输入数字: 爬取指定页数")
-                    print("="*50)
-                    print("请输入页数: ", end="", flush=True)
-                    import sys
-                    user_input = sys.stdin.readline().strip()
-                    if user_input.isdigit() and int(user_input) > 0:
-                        max_pages = int(user_input)
-                except:
-                    pass
-
-            total_pages = 0
-            if max_pages:
-                total_pages = max_pages
-                logging.info(f"目标页数: {total_pages}")
-            else:
-                logging.info("未指定页数，将尝试自动翻页直到结束")
-            
-            all_data = []
-            page = 1
-            last_page_data_str = ""
-            
-            while True:
-                # 检查是否超过总页数
-                if total_pages > 0 and page > total_pages:
-                    logging.info(f"已达到目标页数 {total_pages}，停止抓取")
-                    break
-                    
-                logging.info(f"正在抓取第 {page} 页...")
-                
-                # 提取当前页数据
-                page_data = self.extract_table_data()
-                
-                # 检查数据是否重复 (防止无限循环)
-                current_page_data_str = str(page_data)
-                if current_page_data_str == last_page_data_str:
-                    logging.warning("当前页数据与上一页相同，可能已到达最后一页或翻页失败")
-                    break
-                last_page_data_str = current_page_data_str
+            url = self.find_page_url(page)
+            if url:
+                self.driver.get(url)
+                state, _ = self.readiness.wait(previous=before)
+                if arrived(state):
+                    logging.info(f"已通过URL跳转到第 {page} 页")
+                    return True
+                before = state
+        except Exception as e:
+            logging.warning(f"URL跳页失败: {e}")
+        
+        # 2. 跳页输入框
+        try:
+            inputs = self.driver.find_elements(By.CSS_SELECTOR,
+                ".pagination input, .page input, [class*='paging'] input, [class*='page'] input[type='text'], "
+                "[class*='page'] input[type='number']")
+            jumper = next((box for box in inputs if box.is_displayed()), None)
+            if jumper:
+                self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", jumper)
+                jumper.send_keys(Keys.CONTROL, 'a')
+                jumper.send_keys(str(page))
                 
-                if page_data:
-                    all_data.extend(page_data)
-                    self.data = all_data  # 实时更新实例数据，以便中断时保存
-                    logging.info(f"第 {page} 页提取到 {len(page_data)} 条数据")
+                # 有"确定/GO/跳转"按钮时点击按钮，否则回车
+                buttons = self.driver.find_elements(By.XPATH,
+                    "//*[contains(@class, 'pag') or contains(@class, 'page')]//*[self::a or self::button or self::span]"
+                    "[contains(text(), '确定') or contains(text(), 'GO') or contains(text(), 'Go') or contains(text(), '跳转')]")
+                go_button = next((btn for btn in buttons if btn.is_displayed()), None)
+                if go_button:
+                    self.driver.execute_script("arguments[0].click();", go_button)
                 else:
-                    logging.warning(f"第 {page} 页未提取到数据")
-                    # 如果不是第一页且没有数据，停止抓取
-                    if page > 1:
-                        logging.info("当前页无数据，停止抓取")
-                        break
+                    jumper.send_keys(Keys.ENTER)
                 
-                # 尝试翻页
-                if not self.click_next_page():
-                    logging.info("没有更多页面，停止抓取")
-                    break
-                
-                page += 1
-                time.sleep(3)  # 页面间延迟
-            
-            self.data = all_data
-            logging.info(f"爬取完成，共获取 {len(all_data)} 条数据")
-            
-            return all_data
-            
+                state, _ = self.readiness.wait(previous=before)
+                if arrived(state):
+                    logging.info(f"已跳转到第 {page} 页")
+                    return True
+                logging.warning(f"跳页后未确认到达第 {page} 页，改为逐页翻页")
         except Exception as e:
-            logging.error(f"爬取过程中出错: {e}")
-            return []
+            logging.warning(f"跳页输入框不可用: {e}")
+        
+        return self.step_to_page(page)
+    
+    def open_listing(self):
+        """打开列表页，等待表格渲染并完成登录检查"""
+        logging.info(f"开始访问网站: {self.url}")
+        self.driver.get(self.url)
+        
+        # 等待页面加载 (首次加载给予更长的上限)
+        self.readiness.wait(timeout=max(self.ready_timeout, 30))
+        
+        # 检查是否需要登录
+        self.login_if_needed()
     
     def save_data(self, filename=None):
         """保存数据"""
@@ -701,25 +907,23 @@ class HaoganghuiSpider:
             filename = f"钢材数据_haoganghui_{timestamp}.xlsx"
         
         try:
-            df = pd.DataFrame(self.data)
+            # 只保留存在的列，按指定顺序排列
+            present = set(self.data.fields) if isinstance(self.data, RecordBuffer) else set().union(*self.data)
+            existing_columns = [col for col in EXPORT_COLUMNS if col in present]
             
-            # 定义列顺序
-            columns_order = ['品名', '品类', '材质', '规格', '负差', '支重', '长度', '支/件', '元/吨', '提货地']
-            
-            # 只保留存在的列
-            existing_columns = [col for col in columns_order if col in df.columns]
-            
-            # 按指定顺序排列列
-            df = df[existing_columns]
-            
-            # 保存到Excel
-            df.to_excel(filename, index=False)
-            logging.info(f"数据已保存到: {filename}")
-            
-            # 同时保存为CSV
+            # 分批流式写出 Excel 和 CSV，不再整体构造 DataFrame / 工作簿
             csv_filename = filename.replace('.xlsx', '.csv')
-            df.to_csv(csv_filename, index=False, encoding='utf-8-sig')
-            logging.info(f"数据已保存到: {csv_filename}")
+            sinks = [XlsxSink(filename, existing_columns), CsvSink(csv_filename, existing_columns)]
+            try:
+                for start in range(0, len(self.data), SAVE_BATCH_SIZE):
+                    write_sinks(sinks, self.data[start:start + SAVE_BATCH_SIZE])
+            finally:
+                close_sinks(sinks)
+            
+            # 带类型的 Parquet (价格/重量为数值列)
+            parquet_filename = filename.replace('.xlsx', '.parquet')
+            write_parquet(self.data, parquet_filename, self.site, self.crawl_started_at, existing_columns)
+            logging.info(f"数据已保存到: {parquet_filename}")
             
             return filename
             
@@ -733,7 +937,7 @@ class HaoganghuiSpider:
             logging.warning("没有数据可分析")
             return
         
-        df = pd.DataFrame(self.data)
+        df = records_frame(self.data)
         
         print("\n" + "="*50)
         print("数据统计信息")
@@ -788,14 +992,23 @@ def main():
     
     # 默认参数
     headless = False
+    # 增量采集: 遇到上次已采集的页面即停止 (适用于定时任务)
+    incremental = False
+    # 精简加载: None 时按站点的 lean_profile
+    lean = None
     
     # 从命令行参数获取
     if len(sys.argv) > 1:
         for arg in sys.argv[1:]:
             if arg == '--headless':
                 headless = True
+            elif arg == '--incremental':
+                incremental = True
+            elif arg == '--full-page':
+                # 完整加载页面 (不屏蔽图片/字体/统计脚本)，精简加载导致页面异常时使用
+                lean = False
             elif arg == '--help' or arg == '-h':
-                print("用法: python haoganghui_crawler.py [--headless]")
+                print("用法: python haoganghui_crawler.py [--headless] [--incremental] [--full-page]")
                 print("示例: python haoganghui_crawler.py --headless")
                 return
     
@@ -810,21 +1023,37 @@ def main():
     spider = None
     try:
         # 创建爬虫实例
-        spider = HaoganghuiSpider(headless=headless)
+        spider = HaoganghuiSpider(headless=headless, lean=lean)
         
-        # 执行爬取
-        data = spider.crawl(max_pages=max_pages)
+        # 执行爬取，每完成一页即写入 CSV / Excel
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"钢材数据_haoganghui_{timestamp}"
+        # 同时写入本地历史库
+        store = ListingStore()
+        sinks = open_sinks(filename, fieldnames=EXPORT_COLUMNS) + [SqliteSink(store, spider.site)]
+        try:
+            watermark = CrawlWatermark(spider.site) if incremental else None
+            data = spider.crawl(max_pages=max_pages, sinks=sinks, watermark=watermark)
+        finally:
+            close_sinks(sinks)
+            store.close()
         
         if data:
-            # 保存数据
-            filename = spider.save_data()
+            # 带类型的 Parquet (价格/重量为数值列)
+            write_parquet(data, f"{filename}.parquet", spider.site, spider.crawl_started_at, EXPORT_COLUMNS)
+            
+            # 与上次完整采集比较，只输出变化的挂牌 (没有采集到最后一页时不更新快照，也不统计下架)
+            diff = ListingSnapshot(spider.site).update(data, complete=spider.reached_end)
+            diff_file = write_diff(diff, f"{filename}_变化.jsonl") if diff else None
             
             # 分析数据
             # spider.analyze_data()
             
             print(f"\n{'='*50}")
             print(f"爬取成功!")
-            print(f"数据文件: {filename}")
+            print(f"数据文件: {filename}.xlsx / {filename}.csv / {filename}.parquet")
+            if diff_file:
+                print(f"变化文件: {diff_file}")
             print(f"{'='*50}")
         else:
             print("\n未能获取到数据，可能原因:")
@@ -0,0 +1,352 @@
+"""浏览器登录后直接请求列表接口的 HTTP 采集"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from crawler_common import find_records
+
+# 分页参数名 (按优先级)
+PAGE_PARAM_NAMES = ['pageNum', 'pageNo', 'pageIndex', 'currentPage', 'current', 'page', 'p']
+# 不从浏览器请求转发的请求头 (由 requests 自行管理)
+SKIPPED_HEADERS = {'host', 'cookie', 'content-length', 'connection', 'accept-encoding'}
+# 总页数字段名
+TOTAL_PAGES_KEYS = ['pages', 'totalPage', 'totalPages', 'pageCount', 'totalPageCount']
+# 各站点请求速率上限 (次/秒)，未列出的站点使用 DEFAULT_RATE_LIMIT
+SITE_RATE_LIMITS = {
+    'haoganghui.cn': 3.0,
+    '91xinggang.com': 3.0,
+}
+DEFAULT_RATE_LIMIT = 2.0
+
+
+class ListingEndpoint:
+    """从浏览器请求推断出的列表接口模板，可按页码生成请求"""
+
+    def __init__(self, url, method='GET', headers=None, post_data=None):
+        self.url = url
+        self.method = method.upper()
+        self.headers = {k: v for k, v in (headers or {}).items() if k.lower() not in SKIPPED_HEADERS}
+        self.post_data = post_data
+        # 先确定请求体格式 (分页参数在查询串中时也要原样转发请求体)
+        self.body_format = self.detect_body_format()  # 'json' / 'form' / 'raw' / None
+        self.page_param, self.page_location = self.find_page_param()
+
+    @classmethod
+    def from_request(cls, request):
+        """由 NetworkCapture 记录的请求信息创建"""
+        return cls(request['url'], request.get('method', 'GET'), request.get('headers'), request.get('postData'))
+
+    def _query(self):
+        return parse_qsl(urlsplit(self.url).query, keep_blank_values=True)
+
+    def _json_body(self):
+        try:
+            body = json.loads(self.post_data)
+            return body if isinstance(body, dict) else None
+        except (TypeError, ValueError):
+            return None
+
+    def detect_body_format(self):
+        """按 Content-Type 和请求体内容判断请求体格式；JSON 对象以外的 JSON 和 multipart 原样转发 ('raw')"""
+        if not self.post_data:
+            return None
+        content_type = next((v for k, v in self.headers.items() if k.lower() == 'content-type'), '').lower()
+        if 'multipart' in content_type:
+            return 'raw'
+        if self._json_body() is not None:
+            return 'json'
+        if 'json' in content_type:
+            return 'raw'
+        return 'form'
+
+    def find_page_param(self):
+        """查找分页参数，返回 (参数名, 位置)；位置为 'query' / 'json' / ('json', 外层键) / 'form'"""
+        query_keys = [k for k, _ in self._query()]
+        for name in PAGE_PARAM_NAMES:
+            if name in query_keys:
+                return name, 'query'
+
+        if self.body_format == 'json':
+            body = self._json_body()
+            for name in PAGE_PARAM_NAMES:
+                if name in body and not isinstance(body[name], (dict, list)):
+                    return name, 'json'
+            # 分页参数嵌套一层的情况，如 {"page": {"current": 1, "size": 20}}
+            for outer, value in body.items():
+                if isinstance(value, dict):
+                    for name in PAGE_PARAM_NAMES:
+                        if name in value:
+                            return name, ('json', outer)
+        elif self.body_format == 'form':
+            form_keys = [k for k, _ in parse_qsl(self.post_data, keep_blank_values=True)]
+            for name in PAGE_PARAM_NAMES:
+                if name in form_keys:
+                    return name, 'form'
+
+        return None, None
+
+    def build_request(self, page):
+        """生成指定页码的请求参数 (供 requests.Session.request 使用)；请求体总是原样转发，只改写页码字段"""
+        url, kwargs = self.url, {}
+
+        if self.page_location == 'query':
+            parts = urlsplit(self.url)
+            query = [(k, str(page) if k == self.page_param else v) for k, v in self._query()]
+            url = urlunsplit(parts._replace(query=urlencode(query)))
+
+        if self.body_format == 'json':
+            body = self._json_body()
+            if self.page_location == 'json':
+                body[self.page_param] = page
+            elif isinstance(self.page_location, tuple):
+                body[self.page_location[1]][self.page_param] = page
+            kwargs['json'] = body
+        elif self.body_format == 'form':
+            form = parse_qsl(self.post_data, keep_blank_values=True)
+            if self.page_location == 'form':
+                form = [(k, str(page) if k == self.page_param else v) for k, v in form]
+            kwargs['data'] = form
+        elif self.body_format == 'raw':
+            kwargs['data'] = self.post_data
+
+        return self.method, url, kwargs
+
+
+class DirectHttpFetcher:
+    """复用浏览器登录态 (cookies / 请求头) 的连接池 HTTP 客户端"""
+
+    def __init__(self, endpoint, cookies=None, user_agent=None, pool_size=8, timeout=15):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.reached_end = False  # 翻页时确认已到达最后一页 (空页或超过接口返回的总页数)
+        self.session = requests.Session()
+        # keep-alive 连接池，翻页请求复用同一批连接
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        for cookie in cookies or []:
+            self.session.cookies.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        self.session.headers.update(endpoint.headers)
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+
+    @classmethod
+    def from_driver(cls, driver, endpoint, **kwargs):
+        """从浏览器中取出登录后的 cookies 和 User-Agent"""
+        cookies = driver.get_cookies()
+        user_agent = driver.execute_script("return navigator.userAgent;")
+        return cls(endpoint, cookies=cookies, user_agent=user_agent, **kwargs)
+
+    def fetch_page(self, page):
+        """请求指定页码，返回解析后的 JSON"""
+        method, url, kwargs = self.endpoint.build_request(page)
+        response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+def discover_endpoint(driver, capture, field_map, timeout=15):
+    """从浏览器捕获的请求中识别带分页参数的列表接口，识别失败返回 None"""
+    response, records = capture.wait_for_listing(field_map, timeout=timeout)
+    if not records:
+        # 已经错过首次加载的请求时，刷新页面重新触发
+        logging.info("未捕获到列表接口请求，刷新页面重试...")
+        driver.refresh()
+        response, records = capture.wait_for_listing(field_map, timeout=timeout)
+    if not records:
+        return None
+
+    endpoint = ListingEndpoint.from_request(response['request'])
+    if not endpoint.page_param:
+        logging.warning(f"列表接口未包含可识别的分页参数: {endpoint.url}")
+        return None
+
+    logging.info(f"识别到列表接口: {endpoint.method} {endpoint.url} (分页参数: {endpoint.page_param})")
+    return endpoint
+
+
+def records_digest(records):
+    """数据行摘要，用于识别接口忽略分页参数时返回的重复页"""
+    return hashlib.sha1(json.dumps(records, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def find_total_pages(payload):
+    """从接口响应的前两层中读取总页数，没有返回 None"""
+    levels = [payload]
+    for _ in range(2):
+        nested = []
+        for node in levels:
+            if not isinstance(node, dict):
+                continue
+            for key in TOTAL_PAGES_KEYS:
+                value = node.get(key)
+                if isinstance(value, int) and value > 0:
+                    return value
+            nested.extend(v for v in node.values() if isinstance(v, dict))
+        levels = nested
+    return None
+
+
+def rate_limit_for(url):
+    """按接口域名查找速率上限"""
+    host = urlsplit(url).hostname or ''
+    for site, rate in SITE_RATE_LIMITS.items():
+        if host == site or host.endswith('.' + site):
+            return rate
+    return DEFAULT_RATE_LIMIT
+
+
+def iter_http_pages(fetcher, max_pages=0, start_page=1):
+    """逐页请求列表接口，yield (页码, 原始记录)；遇到空页或与上一页重复时停止"""
+    page = start_page
+    last_digest = None
+    while not max_pages or page <= max_pages:
+        records = find_records(fetcher.fetch_page(page))
+        if not records:
+            logging.info(f"第 {page} 页接口无数据，停止抓取")
+            fetcher.reached_end = True
+            break
+
+        # 接口忽略分页参数时会一直返回同一页
+        digest = records_digest(records)
+        if digest == last_digest:
+            logging.warning("接口返回数据与上一页相同，停止抓取")
+            break
+        last_digest = digest
+
+        yield page, records
+        page += 1
+
+
+class TokenBucket:
+    """asyncio 令牌桶: 平均每秒 rate 个请求，允许 capacity 个突发"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncPageFetcher:
+    """并发请求列表接口: 并发上限 + 站点令牌桶限速 + 抖动退避重试，结果按页码顺序输出"""
+
+    def __init__(self, fetcher, concurrency=4, rate=None, retries=3, backoff=0.5):
+        self.fetcher = fetcher
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate or rate_limit_for(fetcher.endpoint.url))
+        self._semaphore = None
+
+    async def fetch(self, page):
+        """请求一页，返回 (数据行, 总页数)；失败时按指数退避加随机抖动重试"""
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire()
+            try:
+                async with self._semaphore:
+                    # requests 为同步客户端，放到线程中执行，连接池由各线程共享
+                    payload = await asyncio.to_thread(self.fetcher.fetch_page, page)
+                return find_records(payload), find_total_pages(payload)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logging.warning(f"第 {page} 页请求失败 ({e})，{delay:.1f}s 后重试")
+                await asyncio.sleep(delay)
+
+    async def iter_pages(self, max_pages=0, start_page=1):
+        """按页码顺序异步输出 (页码, 数据行)，max_pages 为最后一页的页码 (0 表示不限)；
+        遇到空页、重复页、超过总页数，或不足一页之后的页面请求失败时停止
+        """
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        last_page = max_pages or None
+        window = self.concurrency * 2  # 最多提前调度的页数
+        in_flight = {}
+        next_page = start_page
+        expected = start_page
+        last_digest = None
+        site_last_page = False  # last_page 来自接口返回的总页数
+        page_size = 0  # 已见到的最大每页行数，不足一页说明是最后一页
+        short_page = False
+        try:
+            while last_page is None or expected <= last_page:
+                while len(in_flight) < window and (last_page is None or next_page <= last_page):
+                    in_flight[next_page] = asyncio.ensure_future(self.fetch(next_page))
+                    next_page += 1
+
+                try:
+                    records, total_pages = await in_flight.pop(expected)
+                except Exception as e:
+                    # 总页数未知时会提前调度到最后一页之后，上一页已不足一页时把请求失败当作数据结束
+                    if not short_page:
+                        raise
+                    logging.info(f"第 {expected} 页请求失败 ({e})，上一页已是最后一页，停止抓取")
+                    self.fetcher.reached_end = True
+                    break
+                if total_pages and (last_page is None or total_pages <= last_page):
+                    last_page = total_pages
+                    site_last_page = True
+                if not records:
+                    logging.info(f"第 {expected} 页接口无数据，停止抓取")
+                    self.fetcher.reached_end = True
+                    break
+
+                digest = records_digest(records)
+                if digest == last_digest:
+                    logging.warning("接口返回数据与上一页相同，停止抓取")
+                    break
+                last_digest = digest
+                short_page = len(records) < page_size
+                page_size = max(page_size, len(records))
+
+                yield expected, records
+                expected += 1
+            else:
+                # 按接口总页数取完了最后一页 (只到 max_pages 为止时不算)
+                self.fetcher.reached_end = site_last_page
+        finally:
+            for task in in_flight.values():
+                task.cancel()
+            # 取回已取消/已失败任务的结果，避免 "Task exception was never retrieved"
+            await asyncio.gather(*in_flight.values(), return_exceptions=True)
+
+
+def run_concurrent_pages(fetcher, handle_page, max_pages=0, start_page=1, **kwargs):
+    """在新的事件循环中并发抓取，按页码顺序回调 handle_page(页码, 数据行)；回调返回 False 时停止"""
+    async def consume():
+        engine = AsyncPageFetcher(fetcher, **kwargs)
+        pages = engine.iter_pages(max_pages=max_pages, start_page=start_page)
+        try:
+            async for page, records in pages:
+                if handle_page(page, records) is False:
+                    break
+        finally:
+            await pages.aclose()  # 在事件循环内执行 iter_pages 的清理 (取消并回收未完成的请求)
+
+    asyncio.run(consume())
@@ -0,0 +1,105 @@
+"""在后台线程中执行采集，界面线程通过进度队列轮询，不再阻塞 Streamlit 脚本"""
+import logging
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+
+# 实时预览保留的最近数据行数
+PREVIEW_ROWS = 200
+
+
+class CrawlJob:
+    """后台采集任务: spider.crawl 在工作线程中运行，每完成一页把进度放入队列
+
+    取消为协作式: cancel() 设置 stop_event，爬虫在当前页完成后停止并返回已采集的数据，
+    不会在 WebDriver 命令中途被打断
+    """
+
+    def __init__(self, spider, preview_rows=PREVIEW_ROWS, on_finish=None, **crawl_kwargs):
+        self.spider = spider
+        self.crawl_kwargs = crawl_kwargs
+        self.on_finish = on_finish  # 任务线程结束前调用 (关闭写出器等)
+        self.stop_event = threading.Event()
+        self.progress = queue.Queue()
+        self.preview = deque(maxlen=preview_rows)
+        self.status = 'pending'  # running / finished / cancelled / failed
+        self.result = None
+        self.error = None
+        self.page = 0
+        self.total_pages = 0
+        self.rows = 0
+        self.started_at = None
+        self.finished_at = None
+        self._thread = None
+
+    def start(self):
+        self.status = 'running'
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"crawl-{self.spider.site}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            result = self.spider.crawl(stop_event=self.stop_event, progress_callback=self.progress.put,
+                                       **self.crawl_kwargs)
+            # crawl 出错时返回空列表，已采集的数据仍在 spider.data 中
+            self.result = result if result else self.spider.data
+            self.status = 'cancelled' if self.spider.cancelled else 'finished'
+        except Exception:
+            self.error = traceback.format_exc()
+            self.result = self.spider.data
+            self.status = 'failed'
+            logging.error(f"采集任务失败:\n{self.error}")
+        finally:
+            if self.on_finish:
+                try:
+                    self.on_finish()
+                except Exception as e:
+                    logging.error(f"任务收尾出错: {e}")
+            self.finished_at = time.monotonic()
+
+    def cancel(self):
+        """请求停止 (立即返回，任务在当前页完成后结束)"""
+        if self.running:
+            self.stop_event.set()
+
+    def poll(self):
+        """取出队列中的全部进度，更新页码、行数和预览；返回本次处理的进度条数"""
+        count = 0
+        while True:
+            try:
+                update = self.progress.get_nowait()
+            except queue.Empty:
+                return count
+            count += 1
+            self.page = update['page']
+            self.total_pages = update['total_pages'] or self.total_pages
+            self.rows = update['total_rows']
+            self.preview.extend(update['rows'])
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def stopping(self):
+        return self.running and self.stop_event.is_set()
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def rate(self):
+        """平均每分钟采集的数据行数"""
+        elapsed = self.elapsed
+        return self.rows / elapsed * 60 if elapsed > 0 else 0.0
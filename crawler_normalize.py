@@ -0,0 +1,96 @@
+"""按列批量执行各站点的字段规则，替代逐行解析
+
+输入为提取到的原始单元格矩阵 (每行一个单元格文本列表)，可以是一页，也可以是整次采集的全部行。
+先把矩阵转置为列，每条规则对整列执行一次，最后再按行组装 dict；输出与原来逐行解析的结果完全一致。
+"""
+import re
+
+XINGGANG_COLUMNS = ['品名', '材质', '规格', '负差', '支/件', '支重(吨)', '可售量', '价格(元/吨)', '品牌']
+HAOGANGHUI_COLUMNS = ['品名', '品类', '材质', '规格', '负差', '支重', '长度', '支/件', '元/吨', '提货地']
+
+# 91型钢价格列: 取第一个数字 (可带千分位和小数)
+XINGGANG_PRICE_PATTERN = re.compile(r'(\d{1,3}(?:,\d{3})*(?:\.\d+)?)')
+# 好钢汇 元/吨: 去掉数字和小数点以外的字符
+HAOGANGHUI_PRICE_STRIP = re.compile(r'[^\d\.]')
+
+
+def cell_columns(matrix, width):
+    """把不等长的单元格矩阵转置为 width 列 (缺少的单元格为空字符串)"""
+    rows = [row if len(row) == width else list(row[:width]) + [''] * (width - len(row)) for row in matrix]
+    return list(zip(*rows)) if rows else [()] * width
+
+
+def to_records(columns, names):
+    """按列组装为 dict 列表"""
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+def xinggang_price(value):
+    """提取数字并去掉千分位，提取不到时保留原文"""
+    match = XINGGANG_PRICE_PATTERN.search(value)
+    return match.group(1).replace(',', '') if match else value
+
+
+def xinggang_brand(origin):
+    """从 仓库/产地 中取产地，依次按 换行 / 斜杠 / 空白 分割 (如 "晋南厂库\\n晋南")"""
+    origin = origin.strip()
+    if '\n' in origin:
+        return origin.split('\n')[-1].strip()
+    if '/' in origin:
+        return origin.split('/')[1].strip()
+    if ' ' in origin:
+        return origin.split()[-1]
+    return origin
+
+
+def haoganghui_tolerance(combined):
+    """负差/支重 合并列中的负差，去掉正负号"""
+    return combined.split('/')[0].replace('+', '').replace('-', '~').strip()
+
+
+def haoganghui_weight(combined):
+    parts = combined.split('/')
+    return parts[1].strip() if len(parts) > 1 else ''
+
+
+def haoganghui_price(value):
+    """只保留数字和小数点，清理后为空则保留原文"""
+    return HAOGANGHUI_PRICE_STRIP.sub('', value) or value
+
+
+def normalize_xinggang(matrix):
+    """91型钢: 单元格不少于 8 列的行，按列顺序 品名/材质/规格/负差/支件/支重/可售量/价格/仓库产地 批量转换"""
+    if not matrix:
+        return []
+    cells = cell_columns(matrix, 9)
+    columns = [
+        cells[0], cells[1], cells[2],
+        [value.replace('-', '~') for value in cells[3]],
+        cells[4], cells[5], cells[6],
+        [xinggang_price(value) for value in cells[7]],
+        [xinggang_brand(value) for value in cells[8]],  # 没有第 9 列时为空
+    ]
+    return to_records(columns, XINGGANG_COLUMNS)
+
+
+def normalize_haoganghui(matrix):
+    """好钢汇: 按列顺序 品名/品类/材质/规格/负差支重/长度/支件/件数/件重/元/吨/仓库 批量转换
+
+    不足 10 列的行以及品名、材质、规格、元/吨 全为空的行被丢弃
+    """
+    matrix = [row for row in matrix if len(row) >= 10]
+    if not matrix:
+        return []
+    cells = cell_columns(matrix, 11)
+    columns = [
+        cells[0], cells[1], cells[2], cells[3],
+        [haoganghui_tolerance(value) for value in cells[4]],
+        [haoganghui_weight(value) for value in cells[4]],
+        cells[5], cells[6],
+        [haoganghui_price(value) for value in cells[9]],
+        [value.strip()[-4:] for value in cells[10]],  # 提货地只保留后四个字
+    ]
+    columns = [[value.strip() for value in column] for column in columns]
+
+    records = to_records(columns, HAOGANGHUI_COLUMNS)
+    return [item for item in records if item['品名'] or item['材质'] or item['规格'] or item['元/吨']]
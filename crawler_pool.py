@@ -0,0 +1,309 @@
+"""多浏览器并行采集与进程级浏览器池"""
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from crawler_common import PageDeduplicator, export_browser_session, import_browser_session
+from crawler_storage import RecordBuffer
+
+
+def split_page_ranges(total_pages, workers):
+    """把 1..total_pages 均分为不相交的连续页段 [(起始页, 结束页), ...]"""
+    workers = max(1, min(workers, total_pages))
+    size, extra = divmod(total_pages, workers)
+    ranges = []
+    start = 1
+    for i in range(workers):
+        end = start + size - 1 + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+class CrawlCoordinator:
+    """启动 K 个无头浏览器，共享主浏览器的登录态，各自抓取不相交的页段后按页码合并"""
+
+    def __init__(self, spider_cls, workers=3, headless=True, spider_kwargs=None, stop_event=None):
+        self.spider_cls = spider_cls
+        self.workers = workers
+        self.headless = headless
+        self.spider_kwargs = spider_kwargs or {}
+        self.stop_event = stop_event  # 设置后各浏览器在当前页完成后停止
+        self.missing = []  # 未抓取到的页码
+
+    def crawl(self, primary, total_pages):
+        """以 primary 的登录态并行抓取 total_pages 页，返回按页码合并后的数据"""
+        session = export_browser_session(primary.driver)
+        ranges = split_page_ranges(total_pages, self.workers)
+        logging.info(f"启动 {len(ranges)} 个浏览器并行抓取: {ranges}")
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [pool.submit(self.run_worker, i + 1, session, start, end)
+                       for i, (start, end) in enumerate(ranges)]
+            for future in as_completed(futures):
+                results.update(future.result())
+
+        # 按页码合并，去掉在前面页段已出现过的行 (各浏览器翻页期间挂牌可能漂移)
+        all_data = RecordBuffer()
+        dedup = PageDeduplicator()
+        for page in sorted(results):
+            all_data.extend(dedup.unique_rows(results[page]))
+        if dedup.duplicate_rows:
+            logging.info(f"合并时去除 {dedup.duplicate_rows} 条重复数据")
+
+        self.missing = [p for p in range(1, total_pages + 1) if p not in results]
+        if self.missing:
+            logging.warning(f"以下页面未抓取到: {self.missing}")
+        return all_data
+
+    def run_worker(self, index, session, start_page, end_page):
+        """单个浏览器: 恢复登录态，翻到起始页，抓取 [start_page, end_page]，返回 {页码: 数据}"""
+        spider = None
+        try:
+            spider = self.spider_cls(headless=self.headless, interactive=False, **self.spider_kwargs)
+            import_browser_session(spider.driver, session, spider.url)
+            return self.crawl_range(spider, start_page, end_page, index)
+        except Exception as e:
+            logging.error(f"浏览器 {index} 抓取失败: {e}")
+            return {}
+        finally:
+            if spider and spider.driver:
+                spider.driver.quit()
+
+    def crawl_range(self, spider, start_page, end_page, index=1):
+        """在一个浏览器中抓取连续页段，遇到空页或无法翻页时提前结束"""
+        results = {}
+        spider.readiness.wait()
+        if start_page > 1 and not spider.goto_page(start_page):
+            logging.warning(f"浏览器 {index} 无法翻到第 {start_page} 页")
+            return results
+
+        for page in range(start_page, end_page + 1):
+            if self.stop_event is not None and self.stop_event.is_set():
+                break
+            page_data = spider.extract_table_data()
+            results[page] = page_data
+            logging.info(f"浏览器 {index}: 第 {page} 页提取到 {len(page_data)} 条数据")
+            if not page_data:
+                break
+            if page < end_page and not spider.click_next_page():
+                break
+        return results
+
+
+# 浏览器池: 持久化用户目录的根目录、单个浏览器最多服务的页数、JS 堆内存上限
+PROFILE_ROOT = 'browser_profiles'
+MAX_PAGES_PER_BROWSER = 2000
+MAX_JS_HEAP_MB = 1024
+# 所有配置合计保留的空闲浏览器数 (界面切换选项时会为新配置预热，旧配置的空闲浏览器超出部分关闭)
+MAX_TOTAL_IDLE = 2
+JS_HEAP_SCRIPT = "return window.performance && performance.memory ? performance.memory.usedJSHeapSize : 0;"
+
+
+class PooledBrowser:
+    """池中的一个浏览器及其累计使用情况"""
+
+    def __init__(self, driver, key, profile_dir):
+        self.driver = driver
+        self.key = key
+        self.profile_dir = profile_dir
+        self.pages = 0
+        self.created_at = time.time()
+
+
+class BrowserPool:
+    """进程级浏览器池: 预热 Chrome 并打开站点，按需借给会话，归还后留在池中供下一次任务复用
+
+    每个站点使用持久化的 --user-data-dir (同一目录同一时刻只能被一个 Chrome 使用，并发时依次编号)，
+    登录态和缓存跨任务保留；取出前做健康检查，累计页数或 JS 堆内存超过上限时关闭重建
+    """
+
+    def __init__(self, profile_root=PROFILE_ROOT, max_pages=MAX_PAGES_PER_BROWSER, max_heap_mb=MAX_JS_HEAP_MB,
+                 max_idle=1, max_total_idle=MAX_TOTAL_IDLE):
+        self.profile_root = profile_root
+        self.max_pages = max_pages
+        self.max_heap_mb = max_heap_mb
+        self.max_idle = max_idle  # 每种配置最多保留的空闲浏览器数
+        self.max_total_idle = max_total_idle  # 所有配置合计最多保留的空闲 (含正在预热) 浏览器数
+        self._lock = threading.Lock()
+        self._idle = {}  # 配置 -> [PooledBrowser]
+        self._busy = {}  # id(driver) -> PooledBrowser
+        self._profiles = set()  # 正在使用的用户目录
+        self._warming = {}  # 配置 -> 预热完成事件
+        atexit.register(self.shutdown)
+
+    @staticmethod
+    def pool_key(spider_cls, headless, capture_network, lean=None):
+        """浏览器启动参数不同 (无头、性能日志、精简加载) 的浏览器不能互相替代"""
+        lean = spider_cls.lean_profile if lean is None else lean
+        return spider_cls.site, bool(headless), bool(capture_network), bool(lean)
+
+    def _claim_profile(self, site):
+        with self._lock:
+            index = 0
+            while True:
+                profile_dir = os.path.join(self.profile_root, site if index == 0 else f"{site}-{index}")
+                if profile_dir not in self._profiles:
+                    self._profiles.add(profile_dir)
+                    return profile_dir
+                index += 1
+
+    def _launch(self, spider_cls, headless, capture_network, lean):
+        """启动一个使用持久化用户目录的浏览器并打开站点"""
+        key = self.pool_key(spider_cls, headless, capture_network, lean)
+        profile_dir = self._claim_profile(spider_cls.site)
+        try:
+            spider = spider_cls(headless=headless, interactive=False, capture_network=capture_network,
+                                profile_dir=profile_dir, lean=lean)
+            spider.driver.get(spider.url)
+        except Exception:
+            with self._lock:
+                self._profiles.discard(profile_dir)
+            raise
+        logging.info(f"浏览器池: 已启动 {spider_cls.site} 浏览器 (用户目录 {profile_dir})")
+        return PooledBrowser(spider.driver, key, profile_dir)
+
+    def _trim_idle(self, keep_key, reserve=0):
+        """空闲浏览器合计超过 max_total_idle 时，从其他配置中取出最早启动的浏览器 (在锁内调用，返回需要关闭的浏览器)
+
+        reserve 为即将加入的浏览器数 (正在预热)
+        """
+        excess = sum(len(idle) for idle in self._idle.values()) + reserve - self.max_total_idle
+        if excess <= 0:
+            return []
+        others = sorted((entry for key, idle in self._idle.items() if key != keep_key for entry in idle),
+                        key=lambda entry: entry.created_at)
+        victims = others[:excess]
+        for entry in victims:
+            self._idle[entry.key].remove(entry)
+        return victims
+
+    def _discard(self, entry, reason):
+        logging.info(f"浏览器池: 关闭 {entry.key[0]} 浏览器 ({reason})")
+        try:
+            entry.driver.quit()
+        except Exception as e:
+            logging.debug(f"关闭浏览器失败: {e}")
+        with self._lock:
+            self._profiles.discard(entry.profile_dir)
+
+    def check(self, entry):
+        """健康检查: 能执行脚本且未超过回收阈值时返回 None，否则返回回收原因"""
+        if entry.pages >= self.max_pages:
+            return f"已服务 {entry.pages} 页"
+        try:
+            heap_mb = (entry.driver.execute_script(JS_HEAP_SCRIPT) or 0) / 1024 / 1024
+        except Exception as e:
+            return f"无响应: {e}"
+        if heap_mb > self.max_heap_mb:
+            return f"JS 堆内存 {heap_mb:.0f} MB"
+        return None
+
+    def prewarm(self, spider_cls, headless=False, capture_network=False, lean=None):
+        """后台预热一个浏览器 (已有空闲或正在预热时不重复启动)"""
+        key = self.pool_key(spider_cls, headless, capture_network, lean)
+        with self._lock:
+            if self._idle.get(key) or key in self._warming:
+                return
+            ready = self._warming[key] = threading.Event()
+            # 界面每次切换站点/无头/采集方式都会预热新的配置，先关闭其他配置多余的空闲浏览器
+            victims = self._trim_idle(key, reserve=len(self._warming))
+        for entry in victims:
+            self._discard(entry, "空闲浏览器过多")
+
+        def warm():
+            try:
+                entry = self._launch(spider_cls, headless, capture_network, lean)
+                with self._lock:
+                    self._idle.setdefault(key, []).append(entry)
+                    victims = self._trim_idle(key, reserve=len(self._warming) - 1)
+                for victim in victims:
+                    self._discard(victim, "空闲浏览器过多")
+            except Exception as e:
+                logging.warning(f"浏览器池: 预热失败: {e}")
+            finally:
+                with self._lock:
+                    self._warming.pop(key, None)
+                ready.set()
+
+        threading.Thread(target=warm, name=f"prewarm-{spider_cls.site}", daemon=True).start()
+
+    def acquire(self, spider_cls, headless=False, capture_network=False, lean=None, warm_timeout=60,
+                **spider_kwargs):
+        """借出一个健康的浏览器，包装为新的爬虫实例返回；没有可用浏览器时新启动"""
+        key = self.pool_key(spider_cls, headless, capture_network, lean)
+        with self._lock:
+            ready = self._warming.get(key)
+        if ready is not None:
+            # 正在预热的浏览器通常比重新启动更快就绪
+            ready.wait(warm_timeout)
+
+        entry = None
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                entry = idle.pop() if idle else None
+            if entry is None:
+                break
+            reason = self.check(entry)
+            if reason is None:
+                break
+            self._discard(entry, reason)
+
+        if entry is None:
+            entry = self._launch(spider_cls, headless, capture_network, lean)
+        else:
+            logging.info(f"浏览器池: 复用已预热的 {spider_cls.site} 浏览器")
+
+        with self._lock:
+            self._busy[id(entry.driver)] = entry
+        return spider_cls(headless=headless, interactive=False, capture_network=capture_network,
+                          driver=entry.driver, profile_dir=entry.profile_dir, lean=key[3], **spider_kwargs)
+
+    def release(self, spider):
+        """归还爬虫使用的浏览器；不属于浏览器池、已损坏或超过阈值的浏览器直接关闭"""
+        driver = getattr(spider, 'driver', None)
+        if driver is None:
+            return
+        with self._lock:
+            entry = self._busy.pop(id(driver), None)
+        if entry is None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            return
+
+        entry.pages += len(spider.page_metrics)
+        try:
+            # 丢弃本次任务残留的性能日志，避免下一个任务读到旧的网络响应
+            if spider.capture_network:
+                driver.get_log('performance')
+        except Exception as e:
+            logging.debug(f"清理性能日志失败: {e}")
+        reason = self.check(entry)
+        with self._lock:
+            idle = self._idle.setdefault(entry.key, [])
+            if reason is None and len(idle) >= self.max_idle:
+                reason = "空闲浏览器已足够"
+            if reason is None:
+                idle.append(entry)
+                victims = self._trim_idle(entry.key, reserve=len(self._warming))
+        if reason is not None:
+            self._discard(entry, reason)
+            return
+        for victim in victims:
+            self._discard(victim, "空闲浏览器过多")
+        logging.info(f"浏览器池: {entry.key[0]} 浏览器已归还 (累计 {entry.pages} 页)")
+
+    def shutdown(self):
+        """关闭所有空闲浏览器 (进程退出时调用)"""
+        with self._lock:
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+        for entry in entries:
+            self._discard(entry, "浏览器池关闭")
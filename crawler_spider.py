@@ -0,0 +1,361 @@
+"""两个爬虫共用的采集流程: 续采日志、浏览器翻页/接口直连/多浏览器调度、去重、增量水位线、取消和进度"""
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from crawler_common import PageDeduplicator
+from crawler_http import DirectHttpFetcher, discover_endpoint, iter_http_pages, run_concurrent_pages
+from crawler_pool import CrawlCoordinator
+from crawler_storage import PageJournal, RecordBuffer, write_sinks
+
+
+class SpiderMixin:
+    """需要爬虫提供: site, url, driver, capture, readiness, api_field_map, extract_mode, ready_timeout, page_delay,
+    lean, last_extract_stats, 以及站点相关的 open_listing(), extract_table_data(), parse_page_source(),
+    click_next_page(), goto_page(), get_total_pages() 和 parse_api_record()
+    """
+    close_on_finish = False  # 结束后是否关闭浏览器
+    http_row_filter = None  # 接口直连时的数据行过滤 (各站点的空行规则)
+    
+    def step_to_page(self, page):
+        """从当前页逐页向后翻到指定页"""
+        state = self.readiness.probe()
+        current = state['page'] if state and state['page'] else 1
+        if page < current:
+            logging.warning(f"当前已在第 {current} 页，无法逐页后退到第 {page} 页")
+            return False
+        
+        for _ in range(page - current):
+            if not self.click_next_page():
+                return False
+        return True
+    
+    def stop_requested(self):
+        """协作式取消: stop_event 已设置时返回 True (只在页与页之间检查，不打断 WebDriver 命令)"""
+        if self.stop_event is None or not self.stop_event.is_set():
+            return False
+        if not self.cancelled:
+            self.cancelled = True
+            logging.warning(f"收到停止请求，已采集 {len(self.data)} 条数据，停止抓取")
+        return True
+    
+    def report_progress(self, page, rows, total_pages=0):
+        """把本页进度交给 progress_callback (回调异常不影响采集)"""
+        if not self.progress_callback:
+            return
+        try:
+            self.progress_callback({'page': page, 'total_pages': total_pages, 'rows': list(rows),
+                                    'total_rows': len(self.data)})
+        except Exception as e:
+            logging.debug(f"进度回调出错: {e}")
+    
+    def open_listing(self):
+        """打开列表页并完成登录检查 (各站点实现)"""
+        raise NotImplementedError
+    
+    def crawl(self, max_pages=None, skip_init=False, fetch_mode='browser', concurrency=4, resume=False,
+              journal_path=None, sinks=None, watermark=None, stop_event=None, progress_callback=None,
+              close_on_finish=None):
+        """执行爬取
+
+        fetch_mode: 'browser' 在浏览器中逐页翻页; 'http' 复用浏览器登录态直接请求列表接口;
+                    'async' 同 http，但以 concurrency 个并发请求 (受站点限速约束);
+                    'workers' 启动 concurrency 个无头浏览器共享登录态，并行抓取不相交的页段
+        resume: 从逐页日志 (journal_path，默认 crawl_journal_<站点>.jsonl) 中恢复已完成的页面，
+                从第一个未完成的页面继续；否则清空日志重新开始。正常结束的采集会清空日志，
+                只有停止或出错中断的采集留下的日志可以续采
+        sinks: 流式写出器列表 (crawler_storage.CsvSink 等)，每完成一页即写入，由调用方负责关闭
+        watermark: crawler_diff.CrawlWatermark，列表按最新在前排序时，遇到整页都是上次已采集的数据即提前结束，
+                   结果见 self.watermark_report (多浏览器模式不支持)；停止或出错时不保存新的水位线
+        stop_event: threading.Event，在后台线程中运行时由调用方设置以取消，当前页完成后停止，已采集的数据照常返回，
+                    self.cancelled 为 True
+        progress_callback: 每完成一页调用一次，参数为 {'page', 'total_pages', 'rows' (本页新增数据), 'total_rows'}
+        close_on_finish: 结束后关闭浏览器，默认取站点的 close_on_finish 属性
+        """
+        journal = PageJournal(journal_path or f"crawl_journal_{self.site}.jsonl")
+        self.crawl_started_at = datetime.now()
+        self.watermark_report = None
+        self.duplicate_rows = 0
+        self.stop_event = stop_event
+        self.progress_callback = progress_callback
+        self.cancelled = False
+        self.reached_end = False
+        try:
+            if not skip_init:
+                self.open_listing()
+            
+            # 如果没有指定页数，询问用户
+            if max_pages is None:
+                try:
+                    print("\n" + "="*50)
+                    print("登录完成后，请输入要爬取的页数")
+                    print("直接回车: 爬取直到没有下一页")
+                    print("输入数字: 爬取指定页数")
+                    print("="*50)
+                    print("请输入页数: ", end="", flush=True)
+                    user_input = sys.stdin.readline().strip()
+                    if user_input.isdigit() and int(user_input) > 0:
+                        max_pages = int(user_input)
+                except:
+                    pass
+
+            total_pages = 0
+            if max_pages:
+                total_pages = max_pages
+                logging.info(f"目标页数: {total_pages}")
+            else:
+                logging.info("未指定页数，将尝试自动翻页直到结束")
+            
+            # 每完成一页写入日志；续采时先恢复已完成的页面 (多浏览器模式按页段重新抓取，不续采)
+            restored, start_page = journal.restore(resume and fetch_mode != 'workers')
+            all_data = RecordBuffer(restored)
+            self.data = all_data
+            write_sinks(sinks, all_data)
+            
+            if fetch_mode in ('http', 'async'):
+                http_data = self.crawl_http(total_pages, concurrency if fetch_mode == 'async' else 1,
+                                            journal=journal, start_page=start_page, all_data=all_data,
+                                            sinks=sinks, watermark=watermark, row_filter=self.http_row_filter)
+                if http_data is not None:
+                    self.data = http_data
+                    logging.info(f"爬取完成，共获取 {len(http_data)} 条数据")
+                    return http_data
+                logging.warning("接口直连不可用，改用浏览器翻页")
+            
+            if fetch_mode == 'workers':
+                workers_data = self.crawl_workers(total_pages, concurrency, sinks)
+                if workers_data is not None:
+                    return workers_data
+                logging.warning("无法确定总页数，改用单浏览器翻页")
+            
+            all_data = self.crawl_browser(total_pages, start_page, all_data, journal, sinks, watermark)
+            self.data = all_data
+            if self.duplicate_rows:
+                logging.info(f"共去除 {self.duplicate_rows} 条重复数据")
+            logging.info(f"爬取完成，共获取 {len(all_data)} 条数据")
+            
+            return all_data
+            
+        except Exception as e:
+            logging.error(f"爬取过程中出错: {e}")
+            return []
+        finally:
+            journal.close()
+            if close_on_finish is None:
+                close_on_finish = self.close_on_finish
+            if close_on_finish and getattr(self, 'driver', None):
+                self.driver.quit()
+                logging.info("浏览器已关闭")
+    
+    def crawl_workers(self, total_pages, concurrency, sinks=None):
+        """多个无头浏览器共享登录态并行抓取不相交的页段；总页数不足两页时返回 None"""
+        site_total = not total_pages  # 总页数取自网站分页 (而不是 max_pages)
+        if not total_pages:
+            total_pages = self.get_total_pages()
+        if total_pages <= 1:
+            return None
+        coordinator = CrawlCoordinator(
+            type(self), workers=concurrency,
+            spider_kwargs={'extract_mode': self.extract_mode, 'ready_timeout': self.ready_timeout,
+                           'lean': self.lean},
+            stop_event=self.stop_event)
+        all_data = RecordBuffer(coordinator.crawl(self, total_pages))
+        stopped = self.stop_requested()
+        self.reached_end = site_total and not coordinator.missing and not stopped
+        self.data = all_data
+        self.report_progress(total_pages, all_data, total_pages)
+        write_sinks(sinks, all_data)
+        logging.info(f"爬取完成，共获取 {len(all_data)} 条数据")
+        return all_data
+    
+    def crawl_browser(self, total_pages, start_page, all_data, journal, sinks=None, watermark=None):
+        """在当前浏览器中从 start_page 逐页翻页抓取，新数据追加到 all_data 并逐页写入 journal 和 sinks"""
+        # html 模式下在后台线程解析上一页，浏览器同时翻页
+        parse_pool = ThreadPoolExecutor(max_workers=1) if self.extract_mode == 'html' else None
+        self.page_metrics = []
+        self.readiness.pop_wait()
+        page = start_page
+        dedup = PageDeduplicator(all_data)
+        try:
+            if page > 1 and not (total_pages and page > total_pages):
+                self.readiness.wait()
+                if not self.goto_page(page):
+                    logging.error(f"无法跳转到第 {page} 页，停止续采")
+                    return all_data
+            
+            while True:
+                if self.stop_requested():
+                    break
+                
+                # 检查是否超过总页数
+                if total_pages > 0 and page > total_pages:
+                    logging.info(f"已达到目标页数 {total_pages}，停止抓取")
+                    break
+                    
+                logging.info(f"正在抓取第 {page} 页...")
+                
+                # 提取当前页数据
+                next_clicked = None
+                if parse_pool:
+                    logging.info("正在定位表格数据...")
+                    self.readiness.wait()  # 等待表格加载
+                    future = parse_pool.submit(self.parse_page_source, self.driver.page_source)
+                    wait_seconds = self.readiness.pop_wait()  # 预先翻页的等待计入下一页
+                    # 解析的同时翻到下一页；已到目标页数或已请求停止时不预先翻页
+                    if not (total_pages and page >= total_pages) and not self.stop_requested():
+                        if self.page_delay:
+                            time.sleep(self.page_delay)  # 页面间延迟 (在下一页请求之前)
+                        next_clicked = self.click_next_page()
+                    page_data = future.result()
+                    self.last_extract_stats['commands'] = 1  # 仅获取一次 page_source
+                else:
+                    page_data = self.extract_table_data()
+                    wait_seconds = self.readiness.pop_wait()
+                self.page_metrics.append({
+                    'page': page,
+                    'rows': len(page_data),
+                    **self.last_extract_stats,
+                    'wait_seconds': wait_seconds,
+                })
+                
+                # 按页面指纹检查重复 (翻页失败，或翻页出现 A→B→A 循环)
+                same_as = dedup.seen_page(page, page_data)
+                if same_as is not None:
+                    if same_as == page - 1:
+                        logging.warning("当前页数据与上一页相同，可能已到达最后一页或翻页失败")
+                    else:
+                        logging.warning(f"第 {page} 页与第 {same_as} 页内容相同，翻页出现循环，停止抓取")
+                    break
+                
+                # 增量采集: 整页都是上次已采集过的数据，之后的页面无需再翻
+                if watermark and page_data and watermark.reached(page, page_data):
+                    self.watermark_report = watermark.report(total_pages or self.get_total_pages())
+                    break
+                
+                if page_data:
+                    # 去掉因挂牌漂移在前面页面已出现过的行
+                    rows = dedup.unique_rows(page_data)
+                    all_data.extend(rows)
+                    self.data = all_data  # 实时更新实例数据，以便中断时保存
+                    self.duplicate_rows = dedup.duplicate_rows
+                    journal.append(page, rows)
+                    write_sinks(sinks, rows)
+                    logging.info(f"第 {page} 页提取到 {len(page_data)} 条数据"
+                                 f"{f'，其中 {len(page_data) - len(rows)} 条与前面页面重复' if len(rows) < len(page_data) else ''}")
+                    self.report_progress(page, rows, total_pages)
+                else:
+                    logging.warning(f"第 {page} 页未提取到数据")
+                    # 如果不是第一页且没有数据，停止抓取
+                    if page > 1:
+                        logging.info("当前页无数据，停止抓取")
+                        self.reached_end = True
+                        break
+                
+                # 尝试翻页
+                prefetched = next_clicked is not None
+                if not prefetched:
+                    if total_pages and page >= total_pages:
+                        logging.info(f"已达到目标页数 {total_pages}，停止抓取")
+                        break
+                    if self.stop_requested():
+                        break
+                    next_clicked = self.click_next_page()
+                if not next_clicked:
+                    logging.info("没有更多页面，停止抓取")
+                    self.reached_end = True
+                    break
+                
+                page += 1
+                if self.page_delay and not prefetched:
+                    time.sleep(self.page_delay)  # 页面间延迟
+            
+            if not self.cancelled:
+                # 正常结束 (到达最后一页、目标页数或水位线): 下次不再从本次日志续采，保存新的水位线
+                journal.reset()
+                if watermark:
+                    watermark.save()
+            return all_data
+        finally:
+            if parse_pool:
+                parse_pool.shutdown(wait=False)
+    
+    def crawl_http(self, max_pages=0, concurrency=1, journal=None, start_page=1, all_data=None, sinks=None,
+                   watermark=None, row_filter=None):
+        """复用浏览器登录态直接请求列表接口翻页 (不再渲染页面)，接口不可用时返回 None
+
+        concurrency > 1 时使用 asyncio 并发请求，结果仍按页码顺序合并；
+        从 start_page 开始请求，新数据追加到 all_data 并逐页写入 journal 和 sinks；
+        到达 watermark 时停止请求后续页面；row_filter(数据行) 返回 False 的行被丢弃 (各站点的空行规则)
+        """
+        if not self.capture:
+            logging.warning("未开启网络捕获 (capture_network)，无法识别列表接口")
+            return None
+        
+        endpoint = discover_endpoint(self.driver, self.capture, self.api_field_map, timeout=self.ready_timeout)
+        if not endpoint:
+            return None
+        
+        fetcher = DirectHttpFetcher.from_driver(self.driver, endpoint, pool_size=max(8, concurrency))
+        all_data = all_data if all_data is not None else RecordBuffer()
+        restored = len(all_data)
+        dedup = PageDeduplicator(all_data)
+        self.page_metrics = []
+        last_time = time.perf_counter()
+        
+        def handle_page(page, records):
+            nonlocal last_time
+            if self.stop_requested():
+                return False
+            page_data = [item for item in map(self.parse_api_record, records)
+                         if row_filter is None or row_filter(item)]
+            same_as = dedup.seen_page(page, page_data)
+            if same_as is not None:
+                logging.warning(f"第 {page} 页与第 {same_as} 页内容相同，停止抓取")
+                return False
+            if watermark and page_data and watermark.reached(page, page_data):
+                self.watermark_report = watermark.report(max_pages or self.get_total_pages())
+                return False
+            rows = dedup.unique_rows(page_data)
+            all_data.extend(rows)
+            self.data = all_data  # 实时更新实例数据，以便中断时保存
+            self.duplicate_rows = dedup.duplicate_rows
+            if journal:
+                # 整页被 row_filter 过滤掉也记录该页，续采不会停在这一页
+                journal.append(page, rows)
+            write_sinks(sinks, rows)
+            
+            now = time.perf_counter()
+            self.page_metrics.append({'page': page, 'rows': len(page_data), 'commands': 0,
+                                      'seconds': round(now - last_time, 3)})
+            last_time = now
+            logging.info(f"第 {page} 页提取到 {len(page_data)} 条数据")
+            self.report_progress(page, rows, max_pages)
+        
+        try:
+            if concurrency > 1:
+                logging.info(f"并发请求列表接口 (并发数 {concurrency})")
+                run_concurrent_pages(fetcher, handle_page, max_pages, start_page=start_page, concurrency=concurrency)
+            else:
+                for page, records in iter_http_pages(fetcher, max_pages, start_page=start_page):
+                    if handle_page(page, records) is False:
+                        break
+        except Exception as e:
+            logging.error(f"接口请求失败: {e}")
+            if len(all_data) == restored:
+                return None
+            failed = True
+        else:
+            failed = False
+        finally:
+            fetcher.close()
+        self.reached_end = fetcher.reached_end
+        if not failed and not self.cancelled:
+            # 正常结束: 下次不再从本次日志续采，保存新的水位线
+            if journal:
+                journal.reset()
+            if watermark:
+                watermark.save()
+        
+        return all_data
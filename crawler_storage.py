@@ -0,0 +1,660 @@
+"""采集结果的持久化"""
+import csv
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+from array import array
+from collections.abc import Sequence
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from crawler_common import page_fingerprint
+
+# save_data 每批写出的行数
+SAVE_BATCH_SIZE = 1000
+
+# Parquet 中转为数值的列 (价格、重量)
+NUMERIC_COLUMNS = ['价格(元/吨)', '元/吨', '支重(吨)', '支重', '可售量']
+# 取值重复度高的文本列，使用字典编码 (长度、支/件 可能是 "6-12" 这类范围，保留文本)
+DICTIONARY_COLUMNS = ['品名', '品类', '材质', '品牌', '提货地', '规格', '负差', '长度', '支/件']
+# 本地历史数据库
+DEFAULT_DB_PATH = 'steel_listings.db'
+# 数据库列 -> 各站点对应的字段 (按顺序取第一个存在的字段)，其余字段存入 data (JSON)
+LISTING_FIELDS = {
+    'name': ['品名'],
+    'material': ['材质'],
+    'spec': ['规格'],
+    'tolerance': ['负差'],
+    'origin': ['品牌', '提货地'],
+    'price_text': ['价格(元/吨)', '元/吨'],
+}
+
+# RecordBuffer 中以分类编码存储的高重复字段
+CATEGORICAL_FIELDS = ['品名', '品类', '材质', '品牌', '提货地']
+# 数字后可带单位，如 "9m"、"2.5吨"；"6-12" 之类的范围不转换
+NUMBER_PATTERN = re.compile(r'^\s*([-+]?\d+(?:\.\d+)?)\s*[^\d.]*$')
+
+
+class PageJournal:
+    """逐页追加的采集日志: 每完成一页写入一条记录并 fsync，进程崩溃后可据此续采
+
+    每行一条 JSON: {"page": 页码, "fingerprint": 页面指纹, "rows": [数据...], "ts": 写入时间}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def load(self):
+        """读取已完成的页面 {页码: 记录}；忽略崩溃时写了一半的最后一行"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        # 崩溃时可能截断在多字节字符中间，按替换字符读取，该行随后因 JSON 不完整被跳过
+        with open(self.path, encoding='utf-8', errors='replace') as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                    records[record['page']] = record
+                except (ValueError, KeyError):
+                    logging.warning(f"跳过损坏的日志记录: {self.path} 第 {line_no} 行")
+        return records
+
+    def completed_prefix(self):
+        """从第 1 页起连续完成的页面记录列表 (续采从其后一页开始)"""
+        records = self.load()
+        pages = []
+        page = 1
+        while page in records:
+            pages.append(records[page])
+            page += 1
+        return pages
+
+    def restore(self, resume):
+        """续采时返回 (已完成页面的数据, 起始页)；不续采则清空日志并从第 1 页开始"""
+        if not resume:
+            self.reset()
+            return [], 1
+
+        done = self.completed_prefix()
+        rows = [row for record in done for row in record['rows']]
+        if done:
+            logging.info(f"从日志恢复 {len(done)} 页 / {len(rows)} 条数据，从第 {len(done) + 1} 页继续")
+        return rows, len(done) + 1
+
+    def reset(self):
+        """清空日志 (开始新一轮采集，或采集正常结束后不再续采)"""
+        self.close()
+        open(self.path, 'w', encoding='utf-8').close()
+
+    def append(self, page, rows):
+        """写入一页并落盘"""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+            # 上次崩溃可能留下没有换行的半行，先补上换行，避免与新记录粘在一起
+            if not self._ends_with_newline():
+                self._file.write('\n')
+        record = {
+            'page': page,
+            'fingerprint': page_fingerprint(rows),
+            'rows': rows,
+            'ts': datetime.now().isoformat(timespec='seconds'),
+        }
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RecordBuffer(Sequence):
+    """列式存储的采集结果，替代逐行 dict 列表
+
+    高重复字段 (CATEGORICAL_FIELDS) 存为 int32 编码 + 取值表，其余字段按列存放并复用相同取值的字符串对象。
+    按下标/迭代访问时临时生成 dict，兼容原来的 list[dict] 用法；to_dataframe() 直接由各列构造，不逐行复制。
+    缺失的字段记为 None (分类编码 -1)，生成 dict 时省略。
+    """
+
+    def __init__(self, rows=None):
+        self.fields = []
+        self._columns = {}
+        self._categories = {}   # 字段 -> 取值列表
+        self._lookup = {}       # 字段 -> {取值: 编码 / 共享字符串}
+        self._length = 0
+        if rows:
+            self.extend(rows)
+
+    def _add_field(self, name):
+        self.fields.append(name)
+        self._lookup[name] = {}
+        if name in CATEGORICAL_FIELDS:
+            self._categories[name] = []
+            self._columns[name] = array('i', [-1]) * self._length
+        else:
+            self._columns[name] = [None] * self._length
+
+    def _encode(self, name, value):
+        lookup = self._lookup[name]
+        if name in self._categories:
+            if value is None:
+                return -1
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(self._categories[name])
+                self._categories[name].append(value)
+            return code
+        if isinstance(value, str):
+            return lookup.setdefault(value, value)
+        return value
+
+    def _decode(self, name, index):
+        value = self._columns[name][index]
+        if name in self._categories:
+            return self._categories[name][value] if value >= 0 else None
+        return value
+
+    def append(self, row):
+        for name in row:
+            if name not in self._lookup:
+                self._add_field(name)
+        for name in self.fields:
+            self._columns[name].append(self._encode(name, row.get(name)))
+        self._length += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('RecordBuffer index out of range')
+        row = {}
+        for name in self.fields:
+            value = self._decode(name, index)
+            if value is not None:
+                row[name] = value
+        return row
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self[index]
+
+    def column(self, name):
+        """单列取值列表"""
+        return [self._decode(name, i) for i in range(self._length)]
+
+    def to_dataframe(self):
+        """转换为 DataFrame，分类字段为 pandas Categorical (直接使用编码数组)"""
+        data = {}
+        for name in self.fields:
+            if name in self._categories:
+                # 复制编码数组: 视图会锁住 array 的缓冲区，采集线程之后 append() 时抛出 BufferError
+                codes = np.array(self._columns[name], dtype=np.int32)
+                data[name] = pd.Categorical.from_codes(codes, categories=pd.Index(self._categories[name], dtype=object))
+            else:
+                data[name] = pd.array(self._columns[name], dtype=object)
+        return pd.DataFrame(data, columns=self.fields)
+
+    def memory_usage(self):
+        """估算占用字节数 (列容器 + 取值表 + 各不相同的字符串对象)"""
+        total = sys.getsizeof(self._columns)
+        for name in self.fields:
+            column = self._columns[name]
+            total += sys.getsizeof(column)
+            if name in self._categories:
+                total += sum(sys.getsizeof(v) for v in self._categories[name])
+            else:
+                total += sum(sys.getsizeof(v) for v in self._lookup[name])
+            total += sys.getsizeof(self._lookup[name])
+        return total
+
+
+def records_frame(records):
+    """采集结果转 DataFrame，RecordBuffer 走列式转换"""
+    if isinstance(records, RecordBuffer):
+        return records.to_dataframe()
+    return pd.DataFrame(records)
+
+
+class ResultIndex:
+    """采集结果预览的列索引，过滤和分页在服务端完成，界面只取当前页的行
+
+    文本列预先 factorize 为 (取值表, 行编码)，过滤时只在取值表上做子串匹配再按编码选行；
+    价格列预先解析为数值并排序，价格区间用二分查找
+    """
+
+    # 过滤项 -> 候选字段 (两个站点字段名不同，取第一个存在的)
+    TEXT_FILTERS = {'品名': ['品名'], '材质': ['材质'], '规格': ['规格'], '品牌': ['品牌', '提货地']}
+    PRICE_FIELDS = ['价格(元/吨)', '元/吨']
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.text_columns = {}  # 过滤项 -> (字段名, 行编码, 小写取值表)
+        for label, candidates in self.TEXT_FILTERS.items():
+            name = next((c for c in candidates if c in frame.columns), None)
+            if name is None:
+                continue
+            codes, uniques = pd.factorize(frame[name])
+            self.text_columns[label] = (name, np.asarray(codes), [str(value).casefold() for value in uniques])
+
+        self.price_field = next((c for c in self.PRICE_FIELDS if c in frame.columns), None)
+        if self.price_field:
+            prices = np.array([parse_number(v) for v in frame[self.price_field]], dtype=np.float64)
+            self.price_order = np.argsort(prices, kind='stable')  # NaN 排在最后
+            self.sorted_prices = prices[self.price_order]
+            self.price_count = int(np.count_nonzero(~np.isnan(prices)))
+
+    def __len__(self):
+        return len(self.frame)
+
+    def price_bounds(self):
+        """有效价格的 (最小值, 最大值)，没有价格列或全部无法解析时返回 None"""
+        if not self.price_field or not self.price_count:
+            return None
+        return float(self.sorted_prices[0]), float(self.sorted_prices[self.price_count - 1])
+
+    def filter(self, text_filters=None, price_min=None, price_max=None):
+        """返回符合条件的行号数组 (升序)；文本条件为不区分大小写的子串匹配，多个条件同时满足"""
+        mask = None
+        for label, text in (text_filters or {}).items():
+            needle = (text or '').strip().casefold()
+            if not needle or label not in self.text_columns:
+                continue
+            _, codes, values = self.text_columns[label]
+            matched = [code for code, value in enumerate(values) if needle in value]
+            selected = np.isin(codes, matched)
+            mask = selected if mask is None else mask & selected
+
+        if self.price_field and (price_min is not None or price_max is not None):
+            valid = self.sorted_prices[:self.price_count]
+            low = np.searchsorted(valid, price_min, 'left') if price_min is not None else 0
+            high = np.searchsorted(valid, price_max, 'right') if price_max is not None else self.price_count
+            selected = np.zeros(len(self.frame), dtype=bool)
+            selected[self.price_order[low:high]] = True
+            mask = selected if mask is None else mask & selected
+
+        return np.arange(len(self.frame)) if mask is None else np.flatnonzero(mask)
+
+    def page(self, positions, page, page_size):
+        """取第 page 页 (从 1 开始) 的行"""
+        start = (page - 1) * page_size
+        return self.frame.iloc[positions[start:start + page_size]]
+
+
+class RowSink:
+    """流式写出接口: crawl() 每完成一页调用 write(rows)，结束时 close()
+
+    fieldnames 为空时使用第一批数据的字段顺序
+    """
+
+    def __init__(self, path, fieldnames=None):
+        self.path = path
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.rows_written = 0
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.fieldnames is None:
+            self.fieldnames = list(rows[0].keys())
+        self._write(rows)
+        self.rows_written += len(rows)
+
+    def _write(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvSink(RowSink):
+    """逐页追加的 CSV (utf-8-sig，表头只写一次)，每页写完即 flush，中断后已写入的行仍在磁盘上"""
+
+    def __init__(self, path, fieldnames=None, append=False):
+        super().__init__(path, fieldnames)
+        self.append = append
+        self._file = None
+        self._writer = None
+
+    def _write(self, rows):
+        if self._writer is None:
+            resume = self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0
+            # 追加到已有文件时不能再写 BOM 和表头
+            self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8' if resume else 'utf-8-sig',
+                              newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, restval='', extrasaction='ignore')
+            if not resume:
+                self._writer.writeheader()
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+
+class JsonlSink(RowSink):
+    """逐页追加的 JSON Lines，每行一条数据"""
+
+    def __init__(self, path, fieldnames=None, append=False):
+        super().__init__(path, fieldnames)
+        self.append = append
+        self._file = None
+
+    def _write(self, rows):
+        if self._file is None:
+            self._file = open(self.path, 'a' if self.append else 'w', encoding='utf-8')
+        for row in rows:
+            self._file.write(json.dumps({k: row.get(k, '') for k in self.fieldnames}, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class XlsxSink(RowSink):
+    """openpyxl write_only 模式的 Excel: 行写入后即序列化到临时文件，不在内存中保留整个工作表
+
+    xlsx 为 zip 格式，close() 时才生成最终文件；需要中断后仍可用的文件请同时使用 CsvSink / JsonlSink
+    """
+
+    def __init__(self, path, fieldnames=None):
+        super().__init__(path, fieldnames)
+        from openpyxl import Workbook
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet('Sheet1')
+        self._header_written = False
+
+    def _write(self, rows):
+        if not self._header_written:
+            self._sheet.append(self.fieldnames)
+            self._header_written = True
+        for row in rows:
+            self._sheet.append([row.get(k, '') for k in self.fieldnames])
+
+    def close(self):
+        if self._workbook is not None:
+            if not self._header_written and self.fieldnames:
+                self._sheet.append(self.fieldnames)
+            self._workbook.save(self.path)
+            self._workbook = None
+
+
+def export_fieldnames(rows, fieldnames=None):
+    return list(fieldnames) if fieldnames else (list(rows[0].keys()) if rows else [])
+
+
+def csv_bytes(rows, fieldnames=None):
+    """生成 CSV 文件内容 (utf-8-sig，Excel 可直接打开)，逐行写出，不构建 DataFrame"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=export_fieldnames(rows, fieldnames), restval='', extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+def xlsx_bytes(rows, fieldnames=None):
+    """生成 Excel 文件内容 (openpyxl write_only 模式，逐批写入)"""
+    buffer = io.BytesIO()
+    sink = XlsxSink(buffer, export_fieldnames(rows, fieldnames))
+    for start in range(0, len(rows), SAVE_BATCH_SIZE):
+        sink.write(rows[start:start + SAVE_BATCH_SIZE])
+    sink.close()
+    return buffer.getvalue()
+
+
+SINK_TYPES = {'csv': CsvSink, 'jsonl': JsonlSink, 'xlsx': XlsxSink}
+
+
+def open_sinks(base_filename, formats=('csv', 'xlsx'), fieldnames=None):
+    """按格式创建写出器，文件名为 base_filename 加对应扩展名"""
+    return [SINK_TYPES[fmt](f"{base_filename}.{fmt}", fieldnames=fieldnames) for fmt in formats]
+
+
+def write_sinks(sinks, rows):
+    """把一页数据写入所有写出器"""
+    for sink in sinks or []:
+        sink.write(rows)
+
+
+def close_sinks(sinks):
+    for sink in sinks or []:
+        try:
+            sink.close()
+            logging.info(f"数据已保存到: {sink.path}")
+        except Exception as e:
+            logging.error(f"关闭输出文件失败 {sink.path}: {e}")
+
+
+def parse_number(value):
+    """把导出的文本数值转为 float，无法识别时返回 None"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER_PATTERN.match(str(value).replace(',', ''))
+    return float(match.group(1)) if match else None
+
+
+def to_arrow_table(rows, site, crawl_ts=None, fieldnames=None):
+    """转换为带类型的 Arrow 表: 价格/重量为 float64，重复文本列字典编码，站点和采集时间写入元数据"""
+    import pyarrow as pa
+
+    buffered = isinstance(rows, RecordBuffer)
+    if fieldnames is None:
+        fieldnames = list(rows.fields) if buffered else list(rows[0].keys()) if rows else []
+    crawl_ts = crawl_ts or datetime.now()
+
+    arrays = []
+    for name in fieldnames:
+        if buffered:
+            # 直接按列取值，不逐行重建 dict
+            values = rows.column(name) if name in rows.fields else [None] * len(rows)
+        else:
+            values = [row.get(name) for row in rows]
+        if name in NUMERIC_COLUMNS:
+            arrays.append(pa.array([parse_number(v) for v in values], type=pa.float64()))
+        elif name in DICTIONARY_COLUMNS:
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=pa.string()))
+
+    table = pa.Table.from_arrays(arrays, names=fieldnames)
+    return table.replace_schema_metadata({
+        'site': site,
+        'crawl_ts': crawl_ts.isoformat(timespec='seconds'),
+        'rows': str(len(rows)),
+    })
+
+
+def write_parquet(rows, destination, site, crawl_ts=None, fieldnames=None):
+    """写出 Parquet 文件 (destination 可为路径或文件对象)"""
+    import pyarrow.parquet as pq
+
+    table = to_arrow_table(rows, site, crawl_ts, fieldnames)
+    pq.write_table(table, destination, compression='zstd')
+    return destination
+
+
+def parquet_bytes(rows, site, crawl_ts=None, fieldnames=None):
+    """生成 Parquet 文件内容，供 Streamlit 下载"""
+    import pyarrow as pa
+
+    buffer = pa.BufferOutputStream()
+    write_parquet(rows, buffer, site, crawl_ts, fieldnames)
+    return buffer.getvalue().to_pybytes()
+
+
+def prefix_upper_bound(value):
+    """前缀匹配的上界 (不含): 末字符码位加一，末字符已是最大码位时去掉再进位；没有上界时返回 None"""
+    while value and ord(value[-1]) == sys.maxunicode:
+        value = value[:-1]
+    if not value:
+        return None
+    return value[:-1] + chr(ord(value[-1]) + 1)
+
+
+class ListingStore:
+    """SQLite 历史库: 每次采集一条 crawls 记录，每条挂牌一行 listings (WAL 模式，按页批量写入)"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS crawls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        site TEXT NOT NULL,
+        crawl_ts TEXT NOT NULL,
+        finished_ts TEXT,
+        rows INTEGER DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS listings (
+        crawl_id INTEGER NOT NULL REFERENCES crawls(id),
+        site TEXT NOT NULL,
+        crawl_ts TEXT NOT NULL,
+        name TEXT,
+        material TEXT,
+        spec TEXT,
+        tolerance TEXT,
+        origin TEXT,
+        price REAL,
+        price_text TEXT,
+        data TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_listings_lookup ON listings (site, name, material, spec, crawl_ts);
+    CREATE INDEX IF NOT EXISTS idx_listings_crawl ON listings (crawl_id);
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        # 后台线程采集、页面线程查询共用同一连接；sqlite3 连接对象不能并发使用，所有操作都在锁内执行
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(self.SCHEMA)
+
+    def start_crawl(self, site, crawl_ts=None):
+        """登记一次采集，返回 crawl_id"""
+        crawl_ts = (crawl_ts or datetime.now()).isoformat(timespec='seconds')
+        with self._lock, self.conn:
+            cursor = self.conn.execute('INSERT INTO crawls (site, crawl_ts) VALUES (?, ?)', (site, crawl_ts))
+        return cursor.lastrowid, crawl_ts
+
+    def insert_rows(self, crawl_id, site, crawl_ts, rows):
+        """一页数据一次 executemany，在同一事务中提交"""
+        records = []
+        for row in rows:
+            values = {column: next((row[f] for f in fields if f in row), None)
+                      for column, fields in LISTING_FIELDS.items()}
+            records.append((
+                crawl_id, site, crawl_ts,
+                values['name'], values['material'], values['spec'], values['tolerance'], values['origin'],
+                parse_number(values['price_text']), values['price_text'],
+                json.dumps(row, ensure_ascii=False),
+            ))
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'INSERT INTO listings (crawl_id, site, crawl_ts, name, material, spec, tolerance, origin, '
+                'price, price_text, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', records)
+
+    def finish_crawl(self, crawl_id, rows):
+        with self._lock, self.conn:
+            self.conn.execute('UPDATE crawls SET finished_ts = ?, rows = ? WHERE id = ?',
+                              (datetime.now().isoformat(timespec='seconds'), rows, crawl_id))
+
+    def crawls(self, site=None, limit=50):
+        """最近的采集记录"""
+        sql = 'SELECT id, site, crawl_ts, finished_ts, rows FROM crawls'
+        params = []
+        if site:
+            sql += ' WHERE site = ?'
+            params.append(site)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    def query(self, site=None, name=None, material=None, spec=None, start=None, end=None, limit=5000):
+        """按站点 / 品名 / 材质 / 规格 (前缀匹配) 和采集时间范围查询挂牌价格"""
+        conditions, params = [], []
+        if site:
+            conditions.append('site = ?')
+            params.append(site)
+        # 前缀匹配可以使用 (site, name, material, spec, crawl_ts) 索引
+        for column, value in (('name', name), ('material', material), ('spec', spec)):
+            if value:
+                conditions.append(f'{column} >= ?')
+                params.append(value)
+                upper = prefix_upper_bound(value)
+                if upper:
+                    conditions.append(f'{column} < ?')
+                    params.append(upper)
+        if start:
+            conditions.append('crawl_ts >= ?')
+            params.append(str(start))
+        if end:
+            conditions.append('crawl_ts < ?')
+            params.append(str(end))
+
+        sql = ('SELECT crawl_ts, site, name, material, spec, tolerance, origin, price, price_text '
+               'FROM listings')
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY crawl_ts DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class SqliteSink(RowSink):
+    """把每页数据写入 ListingStore 的写出器；close() 只登记采集完成，不关闭数据库"""
+
+    def __init__(self, store, site, crawl_ts=None):
+        super().__init__(store.path)
+        self.store = store
+        self.site = site
+        self.crawl_id, self.crawl_ts = store.start_crawl(site, crawl_ts)
+
+    def _write(self, rows):
+        self.store.insert_rows(self.crawl_id, self.site, self.crawl_ts, rows)
+
+    def close(self):
+        self.store.finish_crawl(self.crawl_id, self.rows_written)
@@ -4,21 +4,116 @@ import re
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 import undetected_chromedriver as uc
 import logging
+import os
+from crawler_common import (CommandCounter, NetworkCapture, PageReadiness, SessionManager,
+                            apply_lean_options, block_resources, enable_network_capture, map_api_record, parse_html_tables)
+from crawler_diff import CrawlWatermark, ListingSnapshot, write_diff
+from crawler_normalize import normalize_xinggang
+from crawler_spider import SpiderMixin
+from crawler_storage import (SAVE_BATCH_SIZE, CsvSink, ListingStore, SqliteSink,
+                             XlsxSink, close_sinks, open_sinks, records_frame, write_parquet, write_sinks)
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
 
-class XinggangSeleniumSpider:
-    def __init__(self, headless=False, interactive=True):
+# 浏览器内一次性提取整个表格：定位表格、筛选行、收集单元格文本，返回 JSON 数组
+# 保留空单元格以维持列索引对齐；不可见元素返回空文本，与 WebElement.text 一致
+TABLE_SNAPSHOT_JS = """
+var tableSelectors = arguments[0], rowSelector = arguments[1], cellSelector = arguments[2], maxRows = arguments[3];
+function visibleText(el) {
+    return el.getClientRects().length ? el.innerText.trim() : '';
+}
+var table = null, matched = null;
+for (var i = 0; i < tableSelectors.length; i++) {
+    var el = document.querySelector(tableSelectors[i]);
+    if (el && el.getClientRects().length) {
+        table = el;
+        matched = tableSelectors[i];
+        break;
+    }
+}
+if (!table) {
+    return null;
+}
+var rows = table.querySelectorAll(rowSelector);
+if (!rows.length) {
+    rows = document.querySelectorAll("[class*='row'], [class*='tr']");
+}
+var result = [];
+for (var r = 0; r < rows.length && r < maxRows; r++) {
+    var row = rows[r];
+    var rowText = visibleText(row);
+    if (!rowText || rowText.split(/\\s+/).length <= 2) {
+        continue;
+    }
+    var cells = row.querySelectorAll(cellSelector);
+    if (!cells.length) {
+        cells = row.querySelectorAll(':scope > div, :scope > span');
+    }
+    var cellTexts = [];
+    for (var c = 0; c < cells.length; c++) {
+        cellTexts.push(visibleText(cells[c]));
+    }
+    result.push({text: rowText, cells: cellTexts});
+}
+return {selector: matched, total: rows.length, rows: result};
+"""
+
+# 列表接口字段别名 (按顺序匹配，忽略大小写)，用于把 XHR 原始记录映射到输出字段
+API_FIELD_MAP = {
+    '品名': ['productName', 'goodsName', 'breedName', 'categoryName', 'name'],
+    '材质': ['material', 'materialName', 'texture', 'textureName', 'steelGrade'],
+    '规格': ['spec', 'specs', 'specification', 'specName', 'size'],
+    '负差': ['tolerance', 'negativeDeviation', 'deviation', 'weightDeviation'],
+    '支/件': ['piecesPerBundle', 'pieceNum', 'numPerPiece', 'rootPerPiece'],
+    '支重(吨)': ['pieceWeight', 'singleWeight', 'weightPerPiece', 'theoryWeight'],
+    '可售量': ['availableQty', 'saleableQuantity', 'availableWeight', 'stock', 'quantity', 'inventory'],
+    '价格(元/吨)': ['price', 'unitPrice', 'salePrice', 'marketPrice'],
+    '品牌': ['brand', 'brandName', 'origin', 'factoryName', 'manufacturer', 'producer'],
+}
+
+class XinggangSeleniumSpider(SpiderMixin):
+    site = "xinggang91"  # 站点代码 (文件名、历史库、浏览器池用户目录)
+    lean_profile = False  # 登录二维码是图片，精简加载 (不加载图片) 会导致无法扫码登录，默认完整加载
+    close_on_finish = True  # 命令行采集结束后关闭浏览器 (Streamlit 传入 False，由浏览器池回收)
+
+    def __init__(self, headless=False, interactive=True, extract_mode='js', ready_timeout=15, page_delay=0,
+                 capture_network=False, api_url_pattern=None, driver=None, profile_dir=None, lean=None):
         self.url = "https://www.91xinggang.com/#/matchMarket"
+        self.crawl_started_at = None
+        self.watermark_report = None
+        self.duplicate_rows = 0
+        self.stop_event = None  # threading.Event，设置后在页与页之间停止 (协作式取消)
+        self.progress_callback = None  # 每完成一页回调 progress_callback(进度 dict)
+        self.cancelled = False
+        self.reached_end = False  # 本次采集确认到达了最后一页 (结果完整，可以更新变化快照)
         self.interactive = interactive
+        # 提取模式: 'js' 浏览器内一次性提取; 'html' 离线解析 page_source;
+        # 'xhr' 读取页面的列表接口响应; 'dom' 逐元素查询 (旧方式)
+        self.extract_mode = extract_mode
+        # 捕获网络响应 (xhr 模式自动开启)；api_url_pattern 为接口地址正则，None 表示按字段自动识别
+        self.capture_network = capture_network or extract_mode == 'xhr'
+        self.api_url_pattern = api_url_pattern
+        self.api_field_map = dict(API_FIELD_MAP)
+        self.capture = None
+        self.ready_timeout = ready_timeout  # 等待页面就绪的上限 (秒)
+        self.page_delay = page_delay  # 页面间额外延迟 (秒)，默认不等待
+        self.lean = self.lean_profile if lean is None else lean
+        self.profile_dir = profile_dir  # 持久化的 Chrome 用户目录 (登录态、缓存跨次保留)，None 为临时目录
+        self.session = SessionManager(self.site, self.url)  # 保存/恢复登录态 (cookies、localStorage)
         self.data = []
-        self.setup_driver(headless)
+        self.page_metrics = []  # 每页统计: 行数、WebDriver命令数、提取耗时、就绪等待时间
+        # 传入 driver 时直接复用 (浏览器池中已预热的浏览器)，否则新启动一个
+        if driver is not None:
+            self.attach_driver(driver)
+        else:
+            self.setup_driver(headless)
         
     def setup_driver(self, headless=False):
         """设置Chrome驱动"""
@@ -62,6 +157,21 @@ class XinggangSeleniumSpider:
         #     # 尝试使用普通selenium
         #     self.setup_regular_driver(headless)
     
+    def attach_driver(self, driver):
+        """绑定浏览器驱动: 命令计数、网络捕获和页面就绪检测"""
+        self.driver = driver
+        self.commands = CommandCounter(driver)
+        self.capture = NetworkCapture(driver, self.api_url_pattern) if self.capture_network else None
+        if self.lean:
+            block_resources(driver)
+        self.readiness = PageReadiness(
+            self.driver,
+            [".el-table__body-wrapper tbody", "div.el-table tbody", "table tbody", ".ant-table-tbody"],
+            mask_selector=".el-loading-mask, .ant-spin-spinning",
+            pager_selector=".el-pager li.active, .ant-pagination-item-active, .pagination .active",
+            timeout=self.ready_timeout,
+        )
+    
     def setup_regular_driver(self, headless=False):
         """使用普通selenium驱动"""
         try:
@@ -82,7 +192,14 @@ class XinggangSeleniumSpider:
             chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
             chrome_options.add_experimental_option('useAutomationExtension', False)
             
-            self.driver = webdriver.Chrome(options=chrome_options)
+            if self.capture_network:
+                enable_network_capture(chrome_options)
+            if self.lean:
+                apply_lean_options(chrome_options)
+            if self.profile_dir:
+                chrome_options.add_argument(f'--user-data-dir={os.path.abspath(self.profile_dir)}')
+            
+            self.attach_driver(webdriver.Chrome(options=chrome_options))
             logging.info("普通Chrome驱动初始化完成")
             
         except Exception as e:
@@ -100,10 +217,17 @@ class XinggangSeleniumSpider:
             logging.warning(f"等待页面加载超时: {e}")
     
     def login_if_needed(self):
-        """如果需要登录，先登录"""
+        """如果需要登录，先登录 (已登录或保存的登录态仍有效时直接继续)"""
         try:
             logging.info("准备进行登录检查...")
             
+            if not self.interactive:
+                # 非交互模式：恢复登录态，失效时等待手动登录，价格可见的那一刻即继续
+                self.session.ensure_login(self.driver, login_timeout=45)
+                return
+            if self.session.ensure_login(self.driver):
+                return
+            
             # 强制提示用户手动登录，因为价格数据通常需要登录权限
             print("\n" + "="*50)
             print("【重要提示】")
@@ -115,17 +239,14 @@ class XinggangSeleniumSpider:
             print("="*50)
             
             # 等待用户确认
-            if self.interactive:
-                user_input = input("\n登录完成后，请按回车键继续 (输入 's' 跳过登录): ")
-                
-                if user_input.lower() == 's':
-                    logging.info("用户选择跳过登录，继续爬取...")
-                else:
-                    logging.info("用户确认已登录，继续爬取...")
-                    time.sleep(2)
+            user_input = input("\n登录完成后，请按回车键继续 (输入 's' 跳过登录): ")
+            
+            if user_input.lower() == 's':
+                logging.info("用户选择跳过登录，继续爬取...")
             else:
-                logging.info("非交互模式：等待45秒供用户手动登录...")
-                time.sleep(45)
+                logging.info("用户确认已登录，继续爬取...")
+                if self.session.wait_for_login(self.driver, 10):
+                    self.session.save(self.driver)
                 
         except Exception as e:
             logging.error(f"登录过程出错: {e}")
@@ -133,12 +254,122 @@ class XinggangSeleniumSpider:
     
     def extract_table_data(self):
         """提取表格数据"""
+        logging.info("正在定位表格数据...")
+        
+        # 等待表格加载
+        self.readiness.wait()
+        
+        self.commands.reset()
+        start = time.perf_counter()
+        if self.extract_mode == 'js':
+            extracted_data = self.extract_table_data_js()
+        elif self.extract_mode == 'html':
+            extracted_data = self.parse_page_source(self.driver.page_source)
+        elif self.extract_mode == 'xhr':
+            extracted_data = self.extract_captured_data()
+        else:
+            extracted_data = self.extract_table_data_dom()
+        
+        self.last_extract_stats = {
+            'commands': self.commands.reset(),
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+        logging.info(f"本页提取耗时 {self.last_extract_stats['seconds']}s，"
+                     f"WebDriver命令 {self.last_extract_stats['commands']} 次")
+        return extracted_data
+    
+    def save_debug_snapshot(self):
+        """保存截图和页面HTML以便分析页面结构"""
+        logging.warning("未找到表格元素，尝试截图查看页面结构")
+        self.driver.save_screenshot("page_screenshot.png")
+        
+        # 尝试获取页面HTML进行分析
+        page_source = self.driver.page_source
+        with open("page_source.html", "w", encoding="utf-8") as f:
+            f.write(page_source)
+        logging.info("已保存页面HTML到page_source.html")
+    
+    def extract_table_data_js(self):
+        """在浏览器内一次性提取整张表格 (单次 execute_script)"""
         try:
-            logging.info("正在定位表格数据...")
+            snapshot = self.driver.execute_script(
+                TABLE_SNAPSHOT_JS,
+                ["div.el-table", "div.table-container", "table", ".ant-table", "[class*='table']"],
+                "tr, .el-table__row, .ant-table-row",
+                "td, .el-table__cell, .ant-table-cell",
+                50,  # 限制处理前50行
+            )
+            
+            if not snapshot:
+                self.save_debug_snapshot()
+                return []
+            
+            logging.info(f"使用选择器找到表格: {snapshot['selector']}")
+            logging.info(f"找到 {snapshot['total']} 行数据")
             
-            # 等待表格加载
-            time.sleep(5)
+            rows = [(row['cells'], row['text']) for row in snapshot['rows'] if row['cells']]
+            return self.normalize_rows(rows)
             
+        except Exception as e:
+            logging.error(f"提取表格数据失败: {e}")
+            return []
+    
+    def extract_captured_data(self):
+        """从捕获的列表接口响应中提取数据，无需渲染和DOM查询"""
+        response, records = self.capture.wait_for_listing(self.api_field_map, timeout=self.ready_timeout)
+        if not records:
+            logging.warning("未捕获到列表接口响应，改用浏览器内提取")
+            return self.extract_table_data_js()
+        
+        return [self.parse_api_record(record) for record in records]
+    
+    def parse_api_record(self, record):
+        """将接口原始记录映射为输出字段 (数值保留完整精度)"""
+        item = map_api_record(record, self.api_field_map)
+        item['负差'] = item['负差'].replace('-', '~')
+        return item
+    
+    def parse_page_source(self, page_source):
+        """离线解析 page_source 中的表格 (不发起 WebDriver 查询，可在后台线程执行)"""
+        start = time.perf_counter()
+        try:
+            tables, _ = parse_html_tables(page_source)
+            
+            # 跳过隐藏表格和 el-table 固定列渲染的重复表格，优先使用 el-table 内的表格
+            tables = [t for t in tables if not t['hidden'] and not t['fixed']]
+            el_tables = [t for t in tables if t['in_el_table']]
+            if el_tables:
+                tables = el_tables
+            rows = [row for table in tables for row in table['rows']]
+            
+            if not rows:
+                logging.warning("page_source 中未找到表格")
+                with open("page_source.html", "w", encoding="utf-8") as f:
+                    f.write(page_source)
+                logging.info("已保存页面HTML到page_source.html")
+                return []
+            
+            logging.info(f"找到 {len(rows)} 行数据")
+            
+            matrix = []
+            for row in rows[:50]:  # 限制处理前50行
+                row_text = row['text']
+                if row_text and len(row_text.split()) > 2:
+                    cell_texts = [text for _, text in row['cells']]
+                    if cell_texts:
+                        matrix.append((cell_texts, row_text))
+            
+            return self.normalize_rows(matrix)
+            
+        except Exception as e:
+            logging.error(f"解析页面HTML失败: {e}")
+            return []
+        finally:
+            self.last_extract_stats = {'commands': 0, 'seconds': round(time.perf_counter() - start, 3)}
+    
+    def extract_table_data_dom(self):
+        """逐元素查询提取表格数据"""
+        try:
             # 尝试多种方式定位表格
             table_selectors = [
                 "div.el-table",
@@ -159,14 +390,7 @@ class XinggangSeleniumSpider:
                     continue
             
             if not table:
-                logging.warning("未找到表格元素，尝试截图查看页面结构")
-                self.driver.save_screenshot("page_screenshot.png")
-                
-                # 尝试获取页面HTML进行分析
-                page_source = self.driver.page_source
-                with open("page_source.html", "w", encoding="utf-8") as f:
-                    f.write(page_source)
-                logging.info("已保存页面HTML到page_source.html")
+                self.save_debug_snapshot()
                 return []
             
             # 获取表格行
@@ -221,9 +445,25 @@ class XinggangSeleniumSpider:
             logging.error(f"提取表格数据失败: {e}")
             return []
     
+    def normalize_rows(self, rows):
+        """rows 为 [(单元格列表, 行文本)]：不少于 8 列的行按列批量转换，其余逐行解析，保持原有顺序"""
+        full = [i for i, (cells, _) in enumerate(rows) if len(cells) >= 8]
+        results = dict(zip(full, normalize_xinggang([rows[i][0] for i in full])))
+        
+        extracted_data = []
+        for i, (cells, row_text) in enumerate(rows):
+            item = results[i] if i in results else self.parse_row_data(cells, row_text)
+            if item:
+                extracted_data.append(item)
+        return extracted_data
+    
     def parse_row_data(self, cells, row_text):
         """解析行数据"""
         try:
+            # 完整的行与批量转换使用同一套列规则
+            if len(cells) >= 8:
+                return normalize_xinggang([cells])[0]
+            
             # 创建数据项
             item = {
                 # '原始数据': row_text,
@@ -239,49 +479,7 @@ class XinggangSeleniumSpider:
                 # '解析时间': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
             
-            # 优先使用cells列表进行位置映射
-            # 假设列顺序: 品名(0), 材质(1), 规格(2), 负差(3), 支/件(4), 支重(5), 可售量(6), 价格(7), 仓库/产地(8)
-            if len(cells) >= 8:
-                item['品名'] = cells[0]
-                item['材质'] = cells[1]
-                item['规格'] = cells[2]
-                item['负差'] = cells[3].replace('-', '~')
-                item['支/件'] = cells[4]
-                item['支重(吨)'] = cells[5]
-                item['可售量'] = cells[6]
-                
-                # 价格处理: 提取数字
-                price_raw = cells[7]
-                import re
-                price_match = re.search(r'(\d{1,3}(,\d{3})*(\.\d+)?)', price_raw)
-                if price_match:
-                    item['价格(元/吨)'] = price_match.group(1).replace(',', '')
-                else:
-                    item['价格(元/吨)'] = price_raw
-                
-                # 处理品牌 (从仓库/产地中提取产地)
-                if len(cells) >= 9:
-                    warehouse_origin = cells[8].strip()
-                    item['品牌'] = warehouse_origin # 默认使用全部内容
-                    
-                    # 优先处理换行符 (用户提到的情况: 晋南厂库 \n 晋南)
-                    if '\n' in warehouse_origin:
-                        parts = warehouse_origin.split('\n')
-                        # 通常最后一部分是产地/品牌
-                        if len(parts) > 1:
-                            item['品牌'] = parts[-1].strip()
-                    # 处理斜杠
-                    elif '/' in warehouse_origin:
-                        parts = warehouse_origin.split('/')
-                        if len(parts) > 1:
-                            item['品牌'] = parts[1].strip()
-                    # 处理空格 (如果既没有换行也没有斜杠，但有空格分隔)
-                    elif ' ' in warehouse_origin:
-                        parts = warehouse_origin.split()
-                        if len(parts) > 1:
-                            item['品牌'] = parts[-1].strip()
-
-            elif len(cells) >= 7:
+            if len(cells) >= 7:
                  # 可能是某种缩略模式
                 item['品名'] = cells[0]
                 item['材质'] = cells[1]
@@ -359,9 +557,10 @@ class XinggangSeleniumSpider:
         """点击下一页"""
         try:
             logging.info("尝试翻页...")
+            # 记录翻页前的页面状态，用于判断新页面是否渲染完成
+            before = self.readiness.probe()
             # 滚动到底部以确保分页器可见
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
 
             # 查找下一页按钮 - 增加更多选择器
             next_buttons = self.driver.find_elements(By.CSS_SELECTOR, 
@@ -382,7 +581,7 @@ class XinggangSeleniumSpider:
                         # 尝试点击
                         self.driver.execute_script("arguments[0].click();", btn)
                         # btn.click() # 普通点击有时会被遮挡
-                        time.sleep(5)  # 等待页面加载
+                        self.readiness.wait(previous=before)  # 等待页面加载
                         logging.info("已点击下一页")
                         return True
                     except Exception as e:
@@ -407,7 +606,7 @@ class XinggangSeleniumSpider:
                     for elem in next_page_elems:
                         if elem.is_displayed():
                             self.driver.execute_script("arguments[0].click();", elem)
-                            time.sleep(5)
+                            self.readiness.wait(previous=before)
                             logging.info(f"已点击第{next_page_num}页")
                             return True
 
@@ -418,96 +617,43 @@ class XinggangSeleniumSpider:
             logging.error(f"点击下一页失败: {e}")
             return False
     
-    def crawl(self, max_pages=None, skip_init=False, close_on_finish=True):
-        """执行爬取"""
+    def goto_page(self, page):
+        """跳转到指定页: 优先使用分页器的跳页输入框并确认激活页码，必要时退回逐页翻页"""
+        before = self.readiness.probe()
+        if before and before['page'] == page:
+            return True
+        
         try:
-            if not skip_init:
-                logging.info(f"开始访问网站: {self.url}")
-                self.driver.get(self.url)
-                
-                # 等待页面加载
-                self.wait_for_page_load()
-                time.sleep(5)  # 额外等待
-                
-                # 如果需要登录
-                self.login_if_needed()
-            
-            # 如果没有指定页数，询问用户
-            if max_pages is None:
-                try:
-                    print("\n" + "="*50)
-                    print("登录完成后，请输入要爬取的页数")
-                    print("直接回车: 爬取直到没有下一页")
-                    print("输入数字: 爬取指定页数")
-                    print("="*50)
-                    print("请输入页数: ", end="", flush=True)
-                    import sys
-                    user_input = sys.stdin.readline().strip()
-                    if user_input.isdigit() and int(user_input) > 0:
-                        max_pages = int(user_input)
-                except:
-                    pass
-
-            total_pages = 0
-            if max_pages:
-                total_pages = max_pages
-                logging.info(f"目标页数: {total_pages}")
-            else:
-                logging.info("未指定页数，将尝试自动翻页直到结束")
-            
-            all_data = []
-            page = 1
-            last_page_data_str = ""
-            
-            while True:
-                # 检查是否超过总页数
-                if total_pages > 0 and page > total_pages:
-                    logging.info(f"已达到目标页数 {total_pages}，停止抓取")
-                    break
-                    
-                logging.info(f"正在抓取第 {page} 页...")
-                
-                # 提取当前页数据
-                page_data = self.extract_table_data()
+            inputs = self.driver.find_elements(By.CSS_SELECTOR,
+                ".el-pagination__jump input, .ant-pagination-options-quick-jumper input")
+            jumper = next((box for box in inputs if box.is_displayed()), None)
+            if jumper:
+                self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", jumper)
+                # 全选后输入，确保触发 Vue 的 input 事件；回车触发跳页
+                jumper.send_keys(Keys.CONTROL, 'a')
+                jumper.send_keys(str(page), Keys.ENTER)
                 
-                # 检查数据是否重复 (防止无限循环)
-                current_page_data_str = str(page_data)
-                if current_page_data_str == last_page_data_str:
-                    logging.warning("当前页数据与上一页相同，可能已到达最后一页或翻页失败")
-                    break
-                last_page_data_str = current_page_data_str
-                
-                if page_data:
-                    all_data.extend(page_data)
-                    self.data = all_data  # 实时更新实例数据，以便中断时保存
-                    logging.info(f"第 {page} 页提取到 {len(page_data)} 条数据")
-                else:
-                    logging.warning(f"第 {page} 页未提取到数据")
-                    # 如果不是第一页且没有数据，停止抓取
-                    if page > 1:
-                        logging.info("当前页无数据，停止抓取")
-                        break
-                
-                # 尝试点击下一页
-                if not self.click_next_page():
-                    logging.info("没有更多页面，停止抓取")
-                    break
-                
-                page += 1
-                time.sleep(2)  # 页面间延迟
-            
-            self.data = all_data
-            logging.info(f"爬取完成，共获取 {len(all_data)} 条数据")
-            
-            return all_data
-            
+                state, _ = self.readiness.wait(previous=before)
+                if state and state['page'] == page:
+                    logging.info(f"已跳转到第 {page} 页")
+                    return True
+                logging.warning(f"跳页后激活页码不是第 {page} 页，改为逐页翻页")
         except Exception as e:
-            logging.error(f"爬取过程中出错: {e}")
-            return []
-        finally:
-            if close_on_finish and hasattr(self, 'driver'):
-                self.driver.quit()
-                logging.info("浏览器已关闭")
+            logging.warning(f"跳页输入框不可用: {e}")
+        
+        return self.step_to_page(page)
+    
+    def open_listing(self):
+        """打开列表页，等待表格渲染并完成登录检查"""
+        logging.info(f"开始访问网站: {self.url}")
+        self.driver.get(self.url)
+        
+        # 等待页面加载
+        self.wait_for_page_load()
+        self.readiness.wait()  # 等待表格渲染
+        
+        # 如果需要登录
+        self.login_if_needed()
     
     def save_data(self, filename=None):
         """保存数据"""
@@ -520,14 +666,19 @@ class XinggangSeleniumSpider:
             filename = f"钢材市场数据_{timestamp}.xlsx"
         
         try:
-            df = pd.DataFrame(self.data)
-            df.to_excel(filename, index=False)
-            logging.info(f"数据已保存到: {filename}")
-            
-            # 同时保存为CSV
+            # 分批流式写出 Excel 和 CSV，不再整体构造 DataFrame / 工作簿
             csv_filename = filename.replace('.xlsx', '.csv')
-            df.to_csv(csv_filename, index=False, encoding='utf-8-sig')
-            logging.info(f"数据已保存到: {csv_filename}")
+            sinks = [XlsxSink(filename), CsvSink(csv_filename)]
+            try:
+                for start in range(0, len(self.data), SAVE_BATCH_SIZE):
+                    write_sinks(sinks, self.data[start:start + SAVE_BATCH_SIZE])
+            finally:
+                close_sinks(sinks)
+            
+            # 带类型的 Parquet (价格/重量为数值列)
+            parquet_filename = filename.replace('.xlsx', '.parquet')
+            write_parquet(self.data, parquet_filename, self.site, self.crawl_started_at)
+            logging.info(f"数据已保存到: {parquet_filename}")
             
             return filename
             
@@ -541,7 +692,7 @@ class XinggangSeleniumSpider:
             logging.warning("没有数据可分析")
             return
         
-        df = pd.DataFrame(self.data)
+        df = records_frame(self.data)
         
         print("\n" + "="*50)
         print("数据统计信息")
@@ -576,6 +727,8 @@ def main():
     
     # 默认参数
     headless = False
+    # 增量采集: 遇到上次已采集的页面即停止 (适用于定时任务)
+    incremental = '--incremental' in sys.argv
     
     # 尝试从命令行参数获取
     if len(sys.argv) > 1:
@@ -597,14 +750,31 @@ def main():
     print(f"配置: 无头模式: {headless}")
     
     # 创建爬虫实例
-    spider = XinggangSeleniumSpider(headless=headless)
+    # --lean: 精简加载 (屏蔽图片/字体/统计脚本)，会屏蔽登录二维码，只在浏览器目录中已保存登录态时使用
+    spider = XinggangSeleniumSpider(headless=headless, lean='--lean' in sys.argv)
     
-    # 执行爬取
-    data = spider.crawl(max_pages=max_pages)
+    # 执行爬取，每完成一页即写入 CSV / Excel
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"钢材市场数据_{timestamp}"
+    # 同时写入本地历史库
+    store = ListingStore()
+    sinks = open_sinks(filename) + [SqliteSink(store, spider.site)]
+    try:
+        watermark = CrawlWatermark(spider.site) if incremental else None
+        data = spider.crawl(max_pages=max_pages, sinks=sinks, watermark=watermark)
+    finally:
+        close_sinks(sinks)
+        store.close()
     
     if data:
-        # 保存数据
-        spider.save_data()
+        # 带类型的 Parquet (价格/重量为数值列)
+        write_parquet(data, f"{filename}.parquet", spider.site, spider.crawl_started_at)
+        print(f"数据文件: {filename}.xlsx / {filename}.csv / {filename}.parquet")
+        
+        # 与上次完整采集比较，只输出变化的挂牌 (没有采集到最后一页时不更新快照，也不统计下架)
+        diff = ListingSnapshot(spider.site).update(data, complete=spider.reached_end)
+        if diff:
+            print(f"变化文件: {write_diff(diff, f'{filename}_变化.jsonl')}")
         
         # 分析数据
         # spider.analyze_data()
@@ -10,8 +10,12 @@ import streamlit as st
 import pandas as pd
 import time
 import logging
-import io
-from datetime import datetime
+import json
+import queue
+from collections import deque
+from logging.handlers import QueueHandler
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from datetime import datetime, timedelta
 
 # 设置页面配置
 st.set_page_config(
@@ -31,6 +35,12 @@ if current_dir not in sys.path:
 try:
     from crawler_haoganghui import HaoganghuiSpider
     from crawler_xinggang91 import XinggangSeleniumSpider
+    from crawler_diff import CrawlWatermark, ListingSnapshot, diff_records
+    from crawler_job import CrawlJob
+    from crawler_pool import BrowserPool
+    from crawler_common import page_fingerprint
+    from crawler_storage import (DEFAULT_DB_PATH, ListingStore, SqliteSink, close_sinks, csv_bytes, parquet_bytes,
+                                 ResultIndex, records_frame, xlsx_bytes)
 except ImportError as e:
     st.error(f"无法导入爬虫脚本，请确保 crawler_haoganghui.py 和 crawler_xinggang91.py 在同一目录下。\n详细错误: {e}")
 except Exception as e:
@@ -43,6 +53,28 @@ if 'spider_type' not in st.session_state:
     st.session_state.spider_type = None
 if 'crawled_data' not in st.session_state:
     st.session_state.crawled_data = None
+if 'crawl_ts' not in st.session_state:
+    st.session_state.crawl_ts = None
+if 'crawl_diff' not in st.session_state:
+    st.session_state.crawl_diff = None
+if 'watermark_report' not in st.session_state:
+    st.session_state.watermark_report = None
+if 'crawl_job' not in st.session_state:
+    st.session_state.crawl_job = None
+if 'job_notice' not in st.session_state:
+    st.session_state.job_notice = None
+if 'logged_in' not in st.session_state:
+    st.session_state.logged_in = False
+if 'fetch_mode' not in st.session_state:
+    st.session_state.fetch_mode = 'browser'
+
+# 采集引擎 -> crawl(fetch_mode=...)
+FETCH_MODES = {
+    "浏览器翻页": 'browser',
+    "接口直连 (HTTP)": 'http',
+    "并发接口 (Async)": 'async',
+    "多浏览器并行": 'workers',
+}
 
 # 自定义 CSS 美化
 st.markdown("""
@@ -72,17 +104,186 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # 自定义日志处理器
-class StreamlitLogger(logging.Handler):
-    def __init__(self, container):
-        super().__init__()
+class StreamlitLogger(QueueHandler):
+    """任意线程的日志只入队 (采集线程不等待界面渲染)；界面线程取出后存入定长环形缓冲，
+    按时间合并渲染，每秒最多 max_updates 次，flush() 立即渲染剩余日志
+    """
+    def __init__(self, container, lines=15, capacity=500, max_updates=2):
+        super().__init__(queue.SimpleQueue())
         self.container = container
-        self.logs = []
+        self.lines = lines  # 显示最新的日志条数
+        self.logs = deque(maxlen=capacity)
+        self.min_interval = 1.0 / max_updates
+        self._last_render = 0.0
+        self._pending = False
 
     def emit(self, record):
-        msg = self.format(record)
-        self.logs.append(msg)
-        # 保持显示最新的 15 条日志
-        self.container.code("\n".join(self.logs[-15:]), language="text")
+        super().emit(record)
+        # 只有界面脚本线程可以渲染；后台线程的日志等界面线程下一次刷新时显示 (不输出 missing ScriptRunContext 警告)
+        if get_script_run_ctx(suppress_warning=True) is not None:
+            self.render()
+
+    def drain(self):
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self.logs.append(record.msg)  # prepare() 已把 msg 格式化为完整日志行
+            self._pending = True
+
+    def render(self, force=False):
+        self.drain()
+        now = time.monotonic()
+        if not self._pending or (not force and now - self._last_render < self.min_interval):
+            return
+        self.container.code("\n".join(list(self.logs)[-self.lines:]), language="text")
+        self._last_render = now
+        self._pending = False
+
+    def flush(self):
+        self.render(force=True)
+
+@st.cache_resource
+def get_browser_pool():
+    """进程内所有会话共享的浏览器池 (预热的浏览器在任务之间保留)"""
+    return BrowserPool()
+
+def spider_class(spider_type):
+    return HaoganghuiSpider if "好钢汇" in spider_type else XinggangSeleniumSpider
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def export_file(digest, fmt, _rows, site, crawl_ts, fieldnames):
+    """按采集结果的内容指纹缓存导出文件，同一结果的每种格式只生成一次 (_rows 不参与缓存键)"""
+    if fmt == 'csv':
+        return csv_bytes(_rows, fieldnames)
+    if fmt == 'xlsx':
+        return xlsx_bytes(_rows, fieldnames)
+    return parquet_bytes(_rows, site, crawl_ts, fieldnames)
+
+def finish_crawl_job(job):
+    """后台任务结束后在界面线程中收尾: 保存结果、计算变化、归还浏览器"""
+    spider = job.spider
+    data = job.result
+    st.session_state.crawl_job = None
+    if job.status == 'failed':
+        st.session_state.job_notice = ('error', f"❌ 发生错误:\n{job.error}")
+    elif job.status == 'cancelled':
+        st.session_state.job_notice = ('warning', f"⚠️ 任务已停止，保留已采集的 {len(data or [])} 条数据。")
+    else:
+        st.session_state.job_notice = None
+    
+    if not data:
+        if job.status != 'failed':
+            st.session_state.job_notice = ('error', "❌ 未能获取到数据。请检查日志。")
+        return
+    
+    st.session_state.crawled_data = data
+    st.session_state.crawl_digest = page_fingerprint(data)  # 导出文件的缓存键
+    st.session_state.crawl_ts = spider.crawl_started_at
+    # 与该站点上次完整采集比较 (只在采集结束时计算一次；没有采集到最后一页时不更新快照，也不统计下架)
+    st.session_state.watermark_report = spider.watermark_report
+    st.session_state.crawl_diff = None
+    if job.status != 'failed':
+        st.session_state.crawl_diff = ListingSnapshot(spider.site).update(data, complete=spider.reached_end)
+    st.session_state.spider = None
+    get_browser_pool().release(spider)
+
+@st.fragment(run_every=1.0)
+def render_crawl_job():
+    """每秒刷新一次任务进度 (只重跑本片段)，任务结束后整页刷新进入结果展示"""
+    job = st.session_state.crawl_job
+    if job is None:
+        return
+    job.poll()
+    # 采集线程的日志在这里显示 (合并渲染)
+    log_handler = st.session_state.get('log_handler')
+    if log_handler:
+        log_handler.render()
+    if not job.running:
+        finish_crawl_job(job)
+        if log_handler:
+            log_handler.flush()
+        st.rerun()
+    
+    if job.stopping:
+        st.warning("⏳ 正在停止，当前页完成后结束...")
+    else:
+        st.info(f"🏃‍♂️ 正在后台采集 ({st.session_state.spider_type})，可随时停止，已采集的数据会保留。")
+    if job.total_pages:
+        st.progress(min(job.page / job.total_pages, 1.0), text=f"第 {job.page} / {job.total_pages} 页")
+    
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("当前页", job.page)
+    m2.metric("已采集", f"{job.rows} 条")
+    m3.metric("速度", f"{job.rate:.0f} 条/分钟")
+    m4.metric("用时", f"{job.elapsed:.0f} 秒")
+    
+    if st.button("⏹️ 停止采集", type="secondary", use_container_width=True, disabled=job.stopping):
+        job.cancel()  # 下一次刷新时显示 "正在停止"
+    
+    st.caption(f"实时预览 (最近 {len(job.preview)} 条)")
+    st.dataframe(pd.DataFrame(list(job.preview)), use_container_width=True, height=300)
+
+PREVIEW_PAGE_SIZES = [50, 100, 200, 500]
+
+@st.fragment
+def render_preview(index):
+    """服务端过滤和分页的结果预览: 每次操作只重跑本片段，只把当前页的行发送到浏览器"""
+    columns = st.columns(len(index.text_columns) or 1)
+    text_filters = {}
+    for column, (label, (name, _, _)) in zip(columns, index.text_columns.items()):
+        text_filters[label] = column.text_input(name, key=f"preview_{label}", placeholder="包含的文字")
+    
+    bounds = index.price_bounds()
+    p1, p2, p3 = st.columns(3)
+    price_min = p1.number_input(f"最低{index.price_field or '价格'}", value=None, step=100.0, key="preview_price_min",
+                                placeholder=f"{bounds[0]:.0f}" if bounds else "", disabled=bounds is None)
+    price_max = p2.number_input(f"最高{index.price_field or '价格'}", value=None, step=100.0, key="preview_price_max",
+                                placeholder=f"{bounds[1]:.0f}" if bounds else "", disabled=bounds is None)
+    page_size = p3.selectbox("每页行数", PREVIEW_PAGE_SIZES, index=1, key="preview_page_size")
+    
+    positions = index.filter(text_filters, price_min, price_max)
+    pages = max(1, -(-len(positions) // page_size))
+    # 过滤条件变化时回到第 1 页
+    signature = (tuple(text_filters.values()), price_min, price_max, page_size)
+    if st.session_state.get("preview_signature") != signature:
+        st.session_state.preview_signature = signature
+        st.session_state.preview_page = 1
+    page = st.number_input(f"页码 (共 {pages} 页)", min_value=1, max_value=pages, step=1, key="preview_page")
+    
+    st.caption(f"筛选结果 {len(positions)} / {len(index)} 条，当前显示第 {page} 页")
+    st.dataframe(index.page(positions, page, page_size), use_container_width=True)
+
+HISTORY_SITES = {"全部": None, "好钢汇": "haoganghui", "91型钢": "xinggang91"}
+
+def render_history():
+    """查询本地历史库 (不重新读取导出文件)"""
+    c1, c2, c3, c4 = st.columns(4)
+    site = c1.selectbox("平台", list(HISTORY_SITES), key="history_site")
+    name = c2.text_input("品名", key="history_name", placeholder="如 螺纹钢")
+    material = c3.text_input("材质", key="history_material", placeholder="如 HRB400")
+    spec = c4.text_input("规格", key="history_spec", placeholder="如 Φ12")
+    d1, d2 = st.columns(2)
+    start = d1.date_input("开始日期", value=None, key="history_start")
+    end = d2.date_input("结束日期", value=None, key="history_end")
+    
+    if not os.path.exists(DEFAULT_DB_PATH):
+        st.caption("本地历史库为空，完成一次采集后即可查询。")
+        return
+    
+    store = ListingStore()
+    try:
+        # 结束日期当天的数据也包含在内
+        end_ts = (end + timedelta(days=1)).isoformat() if end else None
+        result = store.query(site=HISTORY_SITES[site], name=name.strip(), material=material.strip(),
+                             spec=spec.strip(), start=start.isoformat() if start else None, end=end_ts)
+        st.caption(f"共 {len(result)} 条记录 (最多显示 5000 条)")
+        st.dataframe(result, use_container_width=True)
+        with st.expander("最近的采集记录"):
+            st.dataframe(store.crawls(HISTORY_SITES[site]), use_container_width=True)
+    finally:
+        store.close()
 
 def main():
     # 顶部标题区域
@@ -121,6 +322,37 @@ def main():
             help=headless_help,
             disabled=disabled or is_linux_server
         )
+        lean = st.toggle(
+            "精简加载",
+            value=spider_class(spider_type_selection).lean_profile,
+            help="屏蔽图片、字体、音视频和统计脚本，DOM 就绪即开始读取表格。会屏蔽扫码登录的二维码 (型钢91 默认关闭)；页面显示异常或无法登录时关闭。",
+            disabled=disabled
+        )
+        
+        st.subheader("3. 采集引擎")
+        fetch_mode_selection = st.radio(
+            "采集方式",
+            list(FETCH_MODES),
+            captions=["逐页渲染并读取表格", "登录后直接请求列表接口", "并发请求列表接口 (按站点限速)，速度最快",
+                      "多个无头浏览器共享登录态，分段并行翻页"],
+            index=0,
+            disabled=disabled
+        )
+        concurrency = st.slider(
+            "并发数",
+            min_value=2,
+            max_value=8,
+            value=4,
+            help="并发接口的同时请求数，或多浏览器并行的浏览器数量",
+            disabled=FETCH_MODES[fetch_mode_selection] not in ('async', 'workers')
+        )
+        
+        st.subheader("4. 数据存储")
+        save_history = st.toggle(
+            "写入本地历史库",
+            value=True,
+            help=f"每页数据同时写入 SQLite 数据库 ({DEFAULT_DB_PATH})，可在「历史查询」中按品名/材质/规格查询"
+        )
         
         st.divider()
         
@@ -154,9 +386,13 @@ def main():
         for handler in logger.handlers[:]:
             logger.removeHandler(handler)
         
-        # 添加新的处理器
-        st_handler = StreamlitLogger(log_placeholder)
+        # 添加新的处理器 (日志缓冲保存在会话中，重新运行脚本时不丢失)
         formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(message)s', datefmt='%H:%M:%S')
+        if 'log_handler' not in st.session_state:
+            st.session_state.log_handler = StreamlitLogger(log_placeholder)
+        st_handler = st.session_state.log_handler
+        st_handler.container = log_placeholder
+        st_handler._pending = True  # 新的占位元素需要重新渲染
         st_handler.setFormatter(formatter)
         logger.addHandler(st_handler)
         
@@ -170,6 +406,9 @@ def main():
         # === 阶段 3: 结果展示 ===
         st.balloons()
         st.success("✅ 采集任务完成！")
+        if st.session_state.job_notice:
+            level, message = st.session_state.job_notice
+            getattr(st, level)(message)
         
         data = st.session_state.crawled_data
         
@@ -179,8 +418,20 @@ def main():
         m1.metric("获取数据条数", f"{len(data)} 条")
         m2.metric("状态", "已完成")
         
-        # 数据处理
-        df = pd.DataFrame(data)
+        report = st.session_state.watermark_report
+        if report:
+            skipped = f"，跳过 {report['skipped_pages']} 页" if report['skipped_pages'] is not None else ""
+            st.info(f"增量采集: 第 {report['stopped_at']} 页的数据上次均已采集，提前结束{skipped}。")
+        
+        # 数据处理 (RecordBuffer 按列转换，不逐行复制)；预览索引每个结果只建立一次
+        if not st.session_state.get('crawl_digest'):
+            st.session_state.crawl_digest = page_fingerprint(data)
+        digest = st.session_state.crawl_digest
+        if st.session_state.get('result_index_digest') != digest:
+            st.session_state.result_index = ResultIndex(records_frame(data))
+            st.session_state.result_index_digest = digest
+        result_index = st.session_state.result_index
+        df = result_index.frame
         
         # 生成文件名
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -188,76 +439,131 @@ def main():
         filename = f"钢材数据_{site_code}_{timestamp}.csv"
         
         # 选项卡显示数据和下载
-        tab_preview, tab_download = st.tabs(["👀 数据预览", "💾 下载数据"])
+        tab_preview, tab_changes, tab_download, tab_history = st.tabs(
+            ["👀 数据预览", "🔔 变化", "💾 下载数据", "🗄️ 历史查询"])
         
         with tab_preview:
-            st.dataframe(df, use_container_width=True)
+            render_preview(result_index)
+        
+        with tab_changes:
+            diff = st.session_state.crawl_diff
+            if diff is None:
+                st.info("首次采集该平台 (或本次采集出错)，下次完整采集起显示变化。")
+            else:
+                if diff.get('partial'):
+                    st.caption("本次采集没有到达最后一页，只显示新增和价格变化，快照保持上次完整采集的结果。")
+                c1, c2, c3 = st.columns(3)
+                c1.metric("新增挂牌", len(diff['new']))
+                c2.metric("下架挂牌", len(diff['removed']))
+                c3.metric("价格变化", len(diff['changed']))
+                changes = pd.DataFrame(diff_records(diff))
+                st.dataframe(changes, use_container_width=True)
+                st.download_button(
+                    label="📥 下载变化 (JSONL)",
+                    data=lambda: "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in diff_records(diff)),
+                    file_name=filename.replace('.csv', '_变化.jsonl'),
+                    mime="application/jsonl",
+                )
         
         with tab_download:
-            col_csv, col_xlsx = st.columns(2)
+            # 点击下载时才生成文件 (在独立线程中执行)，同一结果按内容指纹缓存，切换选项卡或重新运行不再重复序列化
+            fieldnames = list(df.columns)
+            crawl_ts = st.session_state.crawl_ts
+            
+            def export(fmt):
+                return lambda: export_file(digest, fmt, data, site_code, crawl_ts, fieldnames)
+            
+            col_csv, col_xlsx, col_parquet = st.columns(3)
             
             with col_csv:
-                csv = df.to_csv(index=False, encoding='utf-8-sig')
                 st.download_button(
                     label="📥 下载 CSV 格式",
-                    data=csv,
+                    data=export('csv'),
                     file_name=filename,
                     mime="text/csv",
                     use_container_width=True
                 )
             
             with col_xlsx:
-                # Excel download
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df.to_excel(writer, index=False, sheet_name='Sheet1')
-                excel_data = output.getvalue()
-                
+                # Excel: openpyxl 只写模式逐批写入，大结果生成需要数秒
                 st.download_button(
                     label="📥 下载 Excel 格式",
-                    data=excel_data,
+                    data=export('xlsx'),
                     file_name=filename.replace('.csv', '.xlsx'),
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     use_container_width=True
                 )
+            
+            with col_parquet:
+                # Parquet: 价格/重量为数值列，站点和采集时间写入文件元数据
+                st.download_button(
+                    label="📥 下载 Parquet 格式",
+                    data=export('parquet'),
+                    file_name=filename.replace('.csv', '.parquet'),
+                    mime="application/vnd.apache.parquet",
+                    use_container_width=True
+                )
+        
+        with tab_history:
+            render_history()
         
         st.markdown("---")
         # 添加显眼的开始新任务按钮
         if st.button("🔄 开始新任务 (返回首页)", type="primary", use_container_width=True):
-            # 清除所有状态以完全重置
+            # 清除所有状态以完全重置 (浏览器在采集结束时已归还浏览器池)
             st.session_state.clear()
             st.rerun()
 
+    elif st.session_state.crawl_job is not None:
+        # === 采集中: 后台线程采集，界面定时轮询进度 ===
+        render_crawl_job()
+
     elif st.session_state.spider is None:
         # === 阶段 1: 启动浏览器 ===
         st.info("👋 欢迎使用！请先启动浏览器进行登录操作。")
         
+        # 按当前选择在后台预热浏览器，点击启动时直接复用
+        pool = get_browser_pool()
+        capture_network = FETCH_MODES[fetch_mode_selection] != 'browser'
+        pool.prewarm(spider_class(spider_type_selection), headless=headless, capture_network=capture_network, lean=lean)
+        
         col_launch, col_space = st.columns([1, 3])
         with col_launch:
             if st.button("🚀 第1步：启动浏览器", type="primary", use_container_width=True):
                 try:
                     with st.spinner('正在启动浏览器...'):
-                        if "好钢汇" in spider_type_selection:
-                            spider = HaoganghuiSpider(headless=headless, interactive=False)
-                        else:
-                            spider = XinggangSeleniumSpider(headless=headless, interactive=False)
+                        fetch_mode = FETCH_MODES[fetch_mode_selection]
+                        # 接口直连需要从浏览器捕获列表接口请求
+                        spider = pool.acquire(spider_class(spider_type_selection), headless=headless,
+                                              capture_network=capture_network, lean=lean)
                         
-                        # 立即打开网页
-                        spider.driver.get(spider.url)
+                        # 预热的浏览器已停在站点页面，否则立即打开网页
+                        if not spider.driver.current_url.startswith(spider.url):
+                            spider.driver.get(spider.url)
+                        
+                        # 恢复保存的登录态，仍有效时无需再手动登录
+                        st.session_state.logged_in = spider.session.ensure_login(spider.driver, probe_timeout=5)
                         
                         # 保存到 Session State
                         st.session_state.spider = spider
                         st.session_state.spider_type = spider_type_selection
+                        st.session_state.fetch_mode = fetch_mode
                         st.rerun()
                         
                 except Exception as e:
                     st.error(f"启动失败: {str(e)}")
                     import traceback
                     st.code(traceback.format_exc())
+        
+        with st.expander("🗄️ 历史数据查询"):
+            render_history()
 
     else:
         # === 阶段 2: 输入页数并采集 ===
-        st.success(f"✅ 浏览器已启动 ({st.session_state.spider_type})！请在浏览器中完成登录，并查看总页数。")
+        if st.session_state.logged_in:
+            st.success(f"✅ 浏览器已启动 ({st.session_state.spider_type})，已恢复上次的登录状态！请查看总页数。")
+        else:
+            st.success(f"✅ 浏览器已启动 ({st.session_state.spider_type})！请在浏览器中完成登录，并查看总页数。")
         
         col_input, col_actions = st.columns([1, 2])
         
@@ -269,6 +575,16 @@ def main():
                 step=1,
                 help="请根据网页显示的实际页数填写"
             )
+            resume = st.checkbox(
+                "断点续采 (从上次中断处继续)",
+                value=False,
+                help="读取上次采集的逐页日志，跳过已完成的页面"
+            )
+            incremental = st.checkbox(
+                "增量采集 (遇到上次已采集的页面即停止)",
+                value=False,
+                help="列表按最新发布排序时使用：某一页的数据上次都已采集过，则不再翻后面的页面"
+            )
         
         with col_actions:
             st.write("") # Spacer
@@ -280,75 +596,45 @@ def main():
                 cancel = st.button("❌ 取消/关闭", type="secondary", use_container_width=True)
         
         if cancel:
-            try:
-                st.session_state.spider.driver.quit()
-            except:
-                pass
+            # 浏览器归还浏览器池 (保留登录态)，下一次任务直接复用
+            get_browser_pool().release(st.session_state.spider)
             st.session_state.spider = None
             st.rerun()
             
+        if st.session_state.job_notice:
+            level, message = st.session_state.job_notice
+            getattr(st, level)(message)
+        
         if start_crawl:
             spider = st.session_state.spider
-            should_rerun = False
+            # 每页数据同时写入本地历史库
+            store = ListingStore() if save_history else None
+            sinks = [SqliteSink(store, spider.site)] if store else []
             
-            try:
-                st.info("正在开始采集，请勿关闭浏览器...")
-                
-                # 执行爬取
-                # skip_init=True: 跳过初始化访问和登录检查，因为用户已经在浏览器中操作过了
-                # close_on_finish=False: 爬取完成后不关闭浏览器，由 Streamlit 控制
-                if "好钢汇" in st.session_state.spider_type:
-                    data = spider.crawl(max_pages=max_pages, skip_init=True)
-                else:
-                    data = spider.crawl(max_pages=max_pages, skip_init=True, close_on_finish=False)
-                
-                if data:
-                    # 保存数据到 session state
-                    st.session_state.crawled_data = data
-                    
-                    # 不再自动保存到本地，由用户点击下载按钮保存
-                    # try:
-                    #     spider.save_data()
-                    # except:
-                    #     pass
-                    
-                    # 清理 spider 对象 (driver 已经在 crawl 内部关闭了)
-                    st.session_state.spider = None
-                    should_rerun = True
-                else:
-                    st.error("❌ 未能获取到数据。请检查日志。")
+            def close_storage():
+                close_sinks(sinks)
+                if store:
+                    store.close()
             
-            except Exception as e:
-                st.error(f"❌ 发生错误: {str(e)}")
-                import traceback
-                st.code(traceback.format_exc())
+            # 保存手动登录后的登录态，下次启动时自动恢复
+            if spider.session.login_state(spider.driver) == 'logged_in':
+                spider.session.save(spider.driver)
             
-            except BaseException as e:
-                # 处理中断 (如用户点击停止按钮)
-                st.warning("⚠️ 任务被中断。正在尝试保存已获取的数据...")
-                if spider and spider.data:
-                    try:
-                        saved_file = spider.save_data()
-                        st.success(f"✅ 已紧急保存 {len(spider.data)} 条数据到: {saved_file}")
-                        
-                        # 即使中断，也显示已获取的数据
-                        st.session_state.crawled_data = spider.data
-                        st.session_state.spider = None
-                        should_rerun = True
-                        
-                    except Exception as save_err:
-                        st.error(f"保存失败: {save_err}")
-            
-            finally:
-                # 如果 driver 还没关（例如被中断），尝试关闭
-                if spider and hasattr(spider, 'driver'):
-                    try:
-                        spider.driver.quit()
-                    except:
-                        pass
+            # skip_init=True: 跳过初始化访问和登录检查，因为用户已经在浏览器中操作过了
+            # close_on_finish=False: 爬取完成后不关闭浏览器，由 Streamlit 归还浏览器池
+            crawl_kwargs = dict(max_pages=max_pages, skip_init=True, fetch_mode=st.session_state.fetch_mode,
+                                concurrency=concurrency, resume=resume, sinks=sinks,
+                                watermark=CrawlWatermark(spider.site) if incremental else None)
+            if "好钢汇" not in st.session_state.spider_type:
+                crawl_kwargs['close_on_finish'] = False
             
-            if should_rerun:
-                st.rerun()
+            # 在后台线程中执行，界面不被阻塞；写出器在任务线程结束时关闭
+            st.session_state.job_notice = None
+            st.session_state.crawl_job = CrawlJob(spider, on_finish=close_storage, **crawl_kwargs).start()
+            st.rerun()
 
 if __name__ == "__main__":
     main()
+    # 本次运行结束前显示剩余日志
+    if 'log_handler' in st.session_state:
+        st.session_state.log_handler.flush()
@@ -0,0 +1,67 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler_common import PageDeduplicator, parse_html_tables
+
+
+def rows(*names):
+    return [{'品名': name, '元/吨': '3650'} for name in names]
+
+
+def test_deduplicator_detects_repeated_and_looping_pages():
+    dedup = PageDeduplicator()
+    assert dedup.seen_page(1, rows('a', 'b')) is None
+    assert dedup.seen_page(2, rows('c', 'd')) is None
+    assert dedup.seen_page(3, rows('c', 'd')) == 2  # 翻页失败
+    assert dedup.seen_page(4, rows('a', 'b')) == 1  # A→B→A 循环
+    assert dedup.seen_page(5, []) is None
+
+
+def test_deduplicator_drops_rows_seen_on_earlier_pages():
+    dedup = PageDeduplicator(rows('restored'))
+    assert dedup.unique_rows(rows('a', 'a', 'restored')) == rows('a', 'a')  # 同一页内的相同行保留
+    assert dedup.unique_rows(rows('b', 'a')) == rows('b')
+    assert dedup.duplicate_rows == 2
+
+
+def cells(row):
+    return [text for _, text in row['cells']]
+
+
+def test_table_spans_keep_one_cell_per_element():
+    # 与浏览器中按 td 元素取单元格一致: colspan/rowspan 不展开，单元格数等于元素数
+    tables, _ = parse_html_tables("""
+        <table><tbody>
+          <tr><td rowspan="2">螺纹钢</td><td colspan="2">HRB400 18</td><td>3650</td></tr>
+          <tr><td>HRB500</td><td>20</td><td>3700</td></tr>
+        </tbody></table>""")
+    assert [cells(row) for row in tables[0]['rows']] == [['螺纹钢', 'HRB400 18', '3650'], ['HRB500', '20', '3700']]
+    assert tables[0]['rows'][0]['text'] == '螺纹钢\tHRB400 18\t3650'
+
+
+def test_table_hidden_cells_and_line_breaks():
+    tables, text = parse_html_tables("""
+        <div class="el-table">
+          <table class="el-table__body"><tr>
+            <td>H型钢</td><td style="display: none">隐藏</td><td>晋南厂库<br>晋南</td>
+            <td>3560<script>var x = 1;</script></td><td></td>
+          </tr></table>
+          <div class="el-table__fixed"><table><tr><td>H型钢</td></tr></table></div>
+        </div>""")
+    body, fixed = tables
+    assert cells(body['rows'][0]) == ['H型钢', '', '晋南厂库\n晋南', '3560', '']
+    assert body['in_el_table'] and not body['fixed']
+    assert fixed['fixed']
+    assert '隐藏' not in text and 'var x' not in text
+
+
+def test_table_nested_and_unclosed_tags():
+    tables, _ = parse_html_tables("""
+        <table id="outer"><tr><td>外层<table><tr><td>内层</td></tr></table></td><td>2</td></tr>
+        <tr><td>a<td>b</table>""")
+    outer, inner = tables
+    assert [cells(row) for row in inner['rows']] == [['内层']]
+    assert cells(outer['rows'][0])[1] == '2'
+    assert cells(outer['rows'][1]) == ['a', 'b']
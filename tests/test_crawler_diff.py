@@ -0,0 +1,93 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler_diff import CrawlWatermark, ListingSnapshot, diff_listings, diff_records, index_listings
+
+SITE = 'test'
+
+
+def listing(name, price, spec='18', origin='丰南'):
+    return {'品名': name, '材质': 'HRB400', '规格': spec, '负差': '', '提货地': origin, '元/吨': price}
+
+
+def test_diff_listings_new_removed_changed():
+    previous = index_listings([listing('螺纹钢', '3650'), listing('盘螺', '3700'), listing('线材', '3800')], SITE)
+    current = index_listings([listing('螺纹钢', '3,660'), listing('盘螺', '3700.0'), listing('圆钢', '3900')], SITE)
+    diff = diff_listings(previous, current)
+    assert [row['品名'] for row in diff['new']] == ['圆钢']
+    assert [row['品名'] for row in diff['removed']] == ['线材']
+    assert len(diff['changed']) == 1
+    changed = diff['changed'][0]
+    assert (changed['品名'], changed['原价格'], changed['价格变化']) == ('螺纹钢', '3650', 10)
+    assert [row['变化类型'] for row in diff_records(diff)] == ['新增', '下架', '价格变化']
+
+
+def test_listing_identity_ignores_width_case_and_whitespace():
+    previous = index_listings([listing('螺纹钢', '3650', spec='Φ18 ')], SITE)
+    current = index_listings([listing('螺纹钢', '3650', spec='φ１８')], SITE)
+    assert diff_listings(previous, current) == {'new': [], 'removed': [], 'changed': []}
+
+
+def test_snapshot_first_run_then_diff(tmp_path):
+    snapshot = ListingSnapshot(SITE, str(tmp_path / 'snapshot.json'))
+    assert snapshot.update([listing('螺纹钢', '3650'), listing('盘螺', '3700')]) is None
+    diff = snapshot.update([listing('螺纹钢', '3700')])
+    assert [row['品名'] for row in diff['removed']] == ['盘螺']
+    assert 'partial' not in diff
+    assert list(snapshot.load().values()) == [listing('螺纹钢', '3700')]
+
+
+def test_snapshot_partial_crawl_keeps_snapshot_and_skips_removals(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    snapshot = ListingSnapshot(SITE, path)
+    assert snapshot.update([listing('螺纹钢', '3650')], complete=False) is None
+    assert not os.path.exists(path)
+
+    snapshot.update([listing('螺纹钢', '3650'), listing('盘螺', '3700')])
+    diff = snapshot.update([listing('螺纹钢', '3660'), listing('圆钢', '3900')], complete=False)
+    assert diff['partial'] is True
+    assert diff['removed'] == []
+    assert [row['品名'] for row in diff['new']] == ['圆钢']
+    assert [row['品名'] for row in diff['changed']] == ['螺纹钢']
+    assert len(snapshot.load()) == 2
+
+
+def page(*names):
+    return [listing(name, '3650') for name in names]
+
+
+def test_watermark_stops_at_previous_pages(tmp_path):
+    path = str(tmp_path / 'watermark.json')
+    first = CrawlWatermark(SITE, path, pages=2)
+    for number, rows in enumerate([page('a', 'b'), page('c', 'd'), page('e', 'f')], 1):
+        assert not first.reached(number, rows)
+    assert first.report(3) is None
+    first.save()
+
+    # 新挂牌排在最前: 第 1 页部分是新数据，第 2 页整页上次已采集
+    second = CrawlWatermark(SITE, path, pages=2)
+    assert not second.reached(1, page('new', 'a'))
+    assert second.reached(2, page('b', 'c'))
+    assert second.report(10) == {'stopped_at': 2, 'skipped_pages': 8}
+    assert second.report(0) == {'stopped_at': 2, 'skipped_pages': None}
+
+
+def test_watermark_keeps_only_first_pages(tmp_path):
+    path = str(tmp_path / 'watermark.json')
+    watermark = CrawlWatermark(SITE, path, pages=1)
+    watermark.reached(1, page('a'))
+    watermark.reached(2, page('b'))
+    watermark.save()
+    reloaded = CrawlWatermark(SITE, path)
+    assert reloaded.reached(1, page('a'))
+    assert not CrawlWatermark(SITE, path).reached(1, page('b'))
+
+
+def test_watermark_without_previous_run_never_stops(tmp_path):
+    watermark = CrawlWatermark(SITE, str(tmp_path / 'missing.json'))
+    assert not watermark.reached(1, page('a'))
+    watermark_path = tmp_path / 'empty.json'
+    CrawlWatermark(SITE, str(watermark_path)).save()
+    assert not watermark_path.exists()
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from crawler_http import ListingEndpoint, run_concurrent_pages
+
+
+def test_get_query_page():
+    endpoint = ListingEndpoint('https://x/api?pageNum=1&size=20')
+    assert endpoint.build_request(3) == ('GET', 'https://x/api?pageNum=3&size=20', {})
+
+
+def test_post_json_body_page():
+    body = json.dumps({'page': {'current': 1, 'size': 20}, 'q': 'x'})
+    endpoint = ListingEndpoint('https://x/api', 'POST', {'Content-Type': 'application/json'}, body)
+    assert endpoint.build_request(4) == (
+        'POST', 'https://x/api', {'json': {'page': {'current': 4, 'size': 20}, 'q': 'x'}})
+
+
+def test_post_form_body_page():
+    endpoint = ListingEndpoint('https://x/api', 'POST', {'Content-Type': 'application/x-www-form-urlencoded'},
+                               'pageNo=1&size=20&q=x')
+    assert endpoint.build_request(2) == (
+        'POST', 'https://x/api', {'data': [('pageNo', '2'), ('size', '20'), ('q', 'x')]})
+
+
+def test_post_query_page_keeps_json_body():
+    body = json.dumps({'page': {'current': 1, 'size': 20}, 'q': 'x'})
+    endpoint = ListingEndpoint('https://x/api?pageNum=1&size=20', 'POST', {'Content-Type': 'application/json'}, body)
+    assert endpoint.build_request(5) == (
+        'POST', 'https://x/api?pageNum=5&size=20', {'json': {'page': {'current': 1, 'size': 20}, 'q': 'x'}})
+
+
+class FakeFetcher:
+    """每页 3 行，last_page 为最后一页 (只有 1 行)，之后的页面请求失败"""
+
+    def __init__(self, last_page):
+        self.endpoint = ListingEndpoint('https://x/api?pageNum=1')
+        self.last_page = last_page
+        self.reached_end = False
+
+    def fetch_page(self, page):
+        if page > self.last_page:
+            raise RuntimeError('404')
+        rows = 1 if page == self.last_page else 3
+        return {'rows': [{'id': f'{page}-{i}'} for i in range(rows)]}
+
+
+def test_async_pages_past_end_fail_after_short_page():
+    fetcher, pages = FakeFetcher(3), []
+    run_concurrent_pages(fetcher, lambda page, records: pages.append(page), concurrency=4, rate=1000, retries=0)
+    assert pages == [1, 2, 3]
+    assert fetcher.reached_end
+
+
+def test_async_pages_failure_after_full_page_raises():
+    fetcher = FakeFetcher(3)
+    fetcher.fetch_page = lambda page: FakeFetcher.fetch_page(fetcher, 5 if page == 2 else page)
+    with pytest.raises(RuntimeError):
+        run_concurrent_pages(fetcher, lambda page, records: None, concurrency=4, rate=1000, retries=0)
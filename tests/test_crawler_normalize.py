@@ -0,0 +1,96 @@
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler_normalize import normalize_haoganghui, normalize_xinggang
+
+# 单元格取值: 覆盖千分位、小数、正负号、斜杠/换行/空白分隔、全角数字和首尾空白
+ALPHABET = ['1', '2', '9', '0', ',', '.', '-', '+', '/', '\n', ' ', 'Q', '钢', '１', '元', '\t']
+
+
+def random_cell(rng):
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 8)))
+
+
+def random_matrix(rng, widths, rows=3000):
+    return [[random_cell(rng) for _ in range(rng.choice(widths))] for _ in range(rows)]
+
+
+def reference_xinggang_row(cells):
+    """原 XinggangSeleniumSpider.parse_row_data 中不少于 8 列的分支"""
+    item = {'品名': cells[0], '材质': cells[1], '规格': cells[2], '负差': cells[3].replace('-', '~'),
+            '支/件': cells[4], '支重(吨)': cells[5], '可售量': cells[6], '价格(元/吨)': '', '品牌': ''}
+    price_match = re.search(r'(\d{1,3}(,\d{3})*(\.\d+)?)', cells[7])
+    item['价格(元/吨)'] = price_match.group(1).replace(',', '') if price_match else cells[7]
+    if len(cells) >= 9:
+        warehouse_origin = cells[8].strip()
+        item['品牌'] = warehouse_origin
+        if '\n' in warehouse_origin:
+            parts = warehouse_origin.split('\n')
+            if len(parts) > 1:
+                item['品牌'] = parts[-1].strip()
+        elif '/' in warehouse_origin:
+            parts = warehouse_origin.split('/')
+            if len(parts) > 1:
+                item['品牌'] = parts[1].strip()
+        elif ' ' in warehouse_origin:
+            parts = warehouse_origin.split()
+            if len(parts) > 1:
+                item['品牌'] = parts[-1].strip()
+    return item
+
+
+def reference_haoganghui_row(cell_texts):
+    """原 HaoganghuiSpider.parse_cell_texts + clean_data"""
+    if len(cell_texts) < 10:
+        return None
+    item = {'品名': cell_texts[0], '品类': cell_texts[1], '材质': cell_texts[2], '规格': cell_texts[3],
+            '负差': '', '支重': '', '长度': cell_texts[5], '支/件': cell_texts[6], '元/吨': cell_texts[9],
+            '提货地': ''}
+    combined_val = cell_texts[4]
+    if '/' in combined_val:
+        parts = combined_val.split('/')
+        item['负差'] = parts[0].replace('+', '').replace('-', '~').strip()
+        if len(parts) > 1:
+            item['支重'] = parts[1].strip()
+    else:
+        item['负差'] = combined_val.replace('+', '').replace('-', '~').strip()
+    if len(cell_texts) >= 11:
+        item['提货地'] = cell_texts[10].strip()[-4:]
+
+    if item.get('元/吨'):
+        price_clean = re.sub(r'[^\d\.]', '', item['元/吨'])
+        if price_clean:
+            item['元/吨'] = price_clean
+    for key in item:
+        if item[key]:
+            item[key] = item[key].strip()
+
+    if not any(item[field] for field in ['品名', '材质', '规格', '元/吨']):
+        return None
+    return item
+
+
+def test_xinggang_matches_row_parser():
+    matrix = random_matrix(random.Random(14), widths=[8, 9, 10])
+    assert normalize_xinggang(matrix) == [reference_xinggang_row(cells) for cells in matrix]
+
+
+def test_haoganghui_matches_row_parser():
+    matrix = random_matrix(random.Random(14), widths=[3, 9, 10, 11, 12])
+    expected = [item for item in map(reference_haoganghui_row, matrix) if item]
+    assert normalize_haoganghui(matrix) == expected
+
+
+def test_known_rows():
+    assert normalize_xinggang([['H型钢', 'Q235B', '200*200', '-3%', '10', '1.2', '30', '约 3,560.50 元', '晋南厂库\n晋南']]) == [
+        {'品名': 'H型钢', '材质': 'Q235B', '规格': '200*200', '负差': '~3%', '支/件': '10', '支重(吨)': '1.2',
+         '可售量': '30', '价格(元/吨)': '3560.50', '品牌': '晋南'}]
+    assert normalize_haoganghui([['螺纹钢', '建材', 'HRB400', ' 18 ', '+-2%/1.8', '12', '5', '3', '5.4', '3,650元',
+                                  '唐山市丰南仓库']]) == [
+        {'品名': '螺纹钢', '品类': '建材', '材质': 'HRB400', '规格': '18', '负差': '~2%', '支重': '1.8', '长度': '12',
+         '支/件': '5', '元/吨': '3650', '提货地': '丰南仓库'}]
+    assert normalize_xinggang([]) == [] and normalize_haoganghui([['a'] * 5]) == []
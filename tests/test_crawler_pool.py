@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler_pool import split_page_ranges
+
+
+def test_split_page_ranges_even_and_uneven():
+    assert split_page_ranges(12, 3) == [(1, 4), (5, 8), (9, 12)]
+    assert split_page_ranges(10, 3) == [(1, 4), (5, 7), (8, 10)]
+
+
+def test_split_page_ranges_more_workers_than_pages():
+    assert split_page_ranges(2, 4) == [(1, 1), (2, 2)]
+    assert split_page_ranges(5, 0) == [(1, 5)]
+
+
+def test_split_page_ranges_cover_every_page_once():
+    for total_pages in range(1, 40):
+        for workers in range(1, 8):
+            ranges = split_page_ranges(total_pages, workers)
+            pages = [page for start, end in ranges for page in range(start, end + 1)]
+            assert pages == list(range(1, total_pages + 1))
+            sizes = [end - start + 1 for start, end in ranges]
+            assert max(sizes) - min(sizes) <= 1
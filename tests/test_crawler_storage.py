@@ -0,0 +1,83 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pytest
+
+from crawler_storage import ListingStore, PageJournal, RecordBuffer, prefix_upper_bound
+
+
+def test_prefix_upper_bound():
+    assert prefix_upper_bound('螺纹') == '螺' + chr(ord('纹') + 1)
+    assert prefix_upper_bound('a' + chr(sys.maxunicode)) == 'b'
+    assert prefix_upper_bound(chr(sys.maxunicode)) is None
+
+
+def test_query_prefix_matches_astral_characters(tmp_path):
+    store = ListingStore(str(tmp_path / 'listings.db'))
+    crawl_id, crawl_ts = store.start_crawl('test')
+    store.insert_rows(crawl_id, 'test', crawl_ts, [
+        {'品名': '螺纹钢', '元/吨': '3500'},
+        {'品名': '螺纹\U00020000', '元/吨': '3600'},
+        {'品名': '盘螺', '元/吨': '3700'},
+    ])
+    result = store.query(name='螺纹')
+    store.close()
+    assert sorted(result['name']) == ['螺纹钢', '螺纹\U00020000']
+
+
+def test_record_buffer_round_trip_and_slicing():
+    rows = [{'品名': '螺纹钢', '规格': '18', '元/吨': '3650'},
+            {'品名': 'H型钢', '材质': 'Q235B', '元/吨': '3560'},
+            {'品名': '螺纹钢', '规格': '20'}]
+    buffer = RecordBuffer(rows[:1])
+    buffer.extend(rows[1:])
+    assert list(buffer) == rows
+    assert len(buffer) == 3
+    assert buffer[-1] == rows[-1]
+    assert buffer[1:] == rows[1:]
+    assert buffer[::2] == rows[::2]
+    assert buffer.column('材质') == [None, 'Q235B', None]
+    with pytest.raises(IndexError):
+        buffer[3]
+
+
+def test_record_buffer_to_dataframe_matches_rows():
+    rows = [{'品名': f'品名{i % 7}', '规格': str(i)} for i in range(50)] + [{'规格': 'x'}]
+    frame = RecordBuffer(rows).to_dataframe()
+    expected = pd.DataFrame(rows)
+    assert list(frame.columns) == list(expected.columns)
+    assert frame.astype(object).where(frame.notna(), None).values.tolist() == \
+        expected.astype(object).where(expected.notna(), None).values.tolist()
+    assert RecordBuffer().to_dataframe().empty
+
+
+def test_page_journal_skips_truncated_last_line(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = PageJournal(path)
+    journal.append(1, [{'品名': 'a'}])
+    journal.append(2, [])
+    journal.close()
+    # 模拟写入第 3 页时崩溃: 半行 JSON，截断在多字节字符中间
+    with open(path, 'ab') as f:
+        f.write('{"page": 3, "rows": [{"品名": "螺'.encode('utf-8')[:-1])
+
+    journal = PageJournal(path)
+    assert sorted(journal.load()) == [1, 2]
+    assert journal.restore(True) == ([{'品名': 'a'}], 3)
+    journal.append(3, [{'品名': 'c'}])
+    journal.close()
+    assert sorted(PageJournal(path).load()) == [1, 2, 3]
+
+
+def test_page_journal_resumes_after_contiguous_prefix(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = PageJournal(path)
+    journal.append(1, [{'品名': 'a'}])
+    journal.append(3, [{'品名': 'c'}])
+    journal.close()
+    assert journal.restore(True) == ([{'品名': 'a'}], 2)
+    assert journal.restore(False) == ([], 1)
+    assert journal.load() == {}